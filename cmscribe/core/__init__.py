@@ -1,13 +1,27 @@
 """Core functionality for cmscribe."""
 
-from .cache import CacheManager
+from . import metrics
+from .cache import CacheManager, atomic_write_json, atomic_write_text
 from .config import (
     DEFAULT_CONFIG_PATH,
     create_config,
     get_default_provider,
     get_provider_config,
+    get_rules_config,
     load_config,
     save_config,
     update_config,
 )
+from .metrics import format_openmetrics, load_runs, load_totals, summarize
+from .output import (
+    STOP_SEQUENCES,
+    output_schema,
+    parse_output,
+    schema_instructions,
+    validate_message,
+)
+from .prompt import Prompt, build_prompt
+from .rules import RuleEngine
+from .singleflight import SingleFlight
+from .snapshot import SnapshotError, export_cache, import_cache
 from .types import CommitFormat
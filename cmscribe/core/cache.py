@@ -3,9 +3,43 @@
 import hashlib
 import json
 import os
+import re
+import tempfile
+import time
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+# Context files are named by their hex cache key; other JSON in the cache root
+# (such as the metrics totals) is not a context
+_CONTEXT_FILE = re.compile(r"^[0-9a-f]+\.json$")
+
+# mkstemp creates files readable only by their owner; written files get the
+# permissions a plain open() would give them instead. The umask can only be
+# read by setting it, so this is done once, before any threads start.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_text(path: Path, text: str) -> None:
+    """Write a file so that readers see either the old contents or the new, never a mix."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.chmod(tmp_name, 0o666 & ~_UMASK)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """Write JSON atomically (see ``atomic_write_text``)."""
+    atomic_write_text(path, json.dumps(data))
+
 
 class CacheManager:
     """Manages caching of provider responses and contexts."""
@@ -40,9 +74,10 @@ class CacheManager:
             return None
         try:
             with open(cache_file) as f:
-                return json.load(f)
+                context = json.load(f)
         except (OSError, json.JSONDecodeError):
             return None
+        return context
 
     def save_context(
         self, repo_name: str, provider: str, model: str, context: Dict[str, Any]
@@ -51,9 +86,62 @@ class CacheManager:
         cache_key = self._get_cache_key(repo_name, provider, model)
         cache_file = self._get_cache_file(cache_key)
 
+        entry = {
+            **context,
+            "repo": repo_name,
+            "provider": provider,
+            "model": model,
+            "updated_at": time.time(),
+        }
+        try:
+            atomic_write_json(cache_file, entry)
+        except OSError as e:
+            print(f"Warning: Failed to save cache: {e}")
+
+    def get_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached generation result by request key."""
+        response_file = self.cache_dir / "responses" / f"{key}.json"
         try:
-            with open(cache_file, "w") as f:
-                json.dump(context, f)
+            with open(response_file) as f:
+                response = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return response
+
+    def save_response(
+        self, key: str, repo_name: str, provider: str, model: str, message: str
+    ) -> None:
+        """Save a generation result under its request key."""
+        response_file = self.cache_dir / "responses" / f"{key}.json"
+        response = {
+            "repo": repo_name,
+            "provider": provider,
+            "model": model,
+            "message": message,
+            "created_at": time.time(),
+        }
+        try:
+            response_file.parent.mkdir(exist_ok=True)
+            atomic_write_json(response_file, response)
+        except OSError as e:
+            print(f"Warning: Failed to save cache: {e}")
+
+    def get_diff(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached normalized diff by blob-pair key."""
+        diff_file = self.cache_dir / "diffs" / f"{key}.json"
+        try:
+            with open(diff_file) as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry
+
+    def save_diff(self, key: str, entry: Dict[str, Any]) -> None:
+        """Save a normalized diff (with the ``repo`` it came from) under its blob-pair key."""
+        diff_file = self.cache_dir / "diffs" / f"{key}.json"
+        try:
+            diff_file.parent.mkdir(exist_ok=True)
+            atomic_write_json(diff_file, {**entry, "created_at": time.time()})
         except OSError as e:
             print(f"Warning: Failed to save cache: {e}")
 
@@ -72,6 +160,47 @@ class CacheManager:
         """Clear all cached contexts."""
         try:
             for cache_file in self.cache_dir.glob("*.json"):
-                cache_file.unlink()
+                if _CONTEXT_FILE.match(cache_file.name):
+                    cache_file.unlink()
         except OSError as e:
             print(f"Warning: Failed to clear all caches: {e}")
+
+    def clear_responses(
+        self,
+        repo_name: Optional[str] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+    ) -> None:
+        """Clear cached generation results matching the given fields (None matches any)."""
+        wanted = {
+            field: value
+            for field, value in (("repo", repo_name), ("provider", provider), ("model", model))
+            if value is not None
+        }
+        try:
+            for response_file in (self.cache_dir / "responses").glob("*.json"):
+                try:
+                    with open(response_file) as f:
+                        response = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                if all(response.get(field) == value for field, value in wanted.items()):
+                    response_file.unlink()
+        except OSError as e:
+            print(f"Warning: Failed to clear response cache: {e}")
+
+    def clear_all_responses(self) -> None:
+        """Clear all cached generation results."""
+        try:
+            for response_file in (self.cache_dir / "responses").glob("*.json"):
+                response_file.unlink()
+        except OSError as e:
+            print(f"Warning: Failed to clear response cache: {e}")
+
+    def clear_all_diffs(self) -> None:
+        """Clear all cached normalized diffs."""
+        try:
+            for diff_file in (self.cache_dir / "diffs").glob("*.json"):
+                diff_file.unlink()
+        except OSError as e:
+            print(f"Warning: Failed to clear diff cache: {e}")
@@ -56,6 +56,18 @@ DEFAULT_CONFIG = {
         "auto_commit": "false",
         "cache_responses": "true",
     },
+    "Rules": {
+        "enabled": "true",
+        "deps": (
+            "uv.lock, poetry.lock, Pipfile.lock, requirements*.txt, package-lock.json, "
+            "yarn.lock, pnpm-lock.yaml, Cargo.lock, go.sum"
+        ),
+        "docs": "*.md, *.rst, docs/*, LICENSE*, AUTHORS*",
+        "version": (
+            "pyproject.toml, setup.cfg, setup.py, package.json, Cargo.toml, "
+            "__init__.py, _version.py, version.py, VERSION"
+        ),
+    },
     "openai": {
         "model": "gpt-3.5-turbo",
         "endpoint": "https://api.openai.com/v1",
@@ -229,6 +241,16 @@ def get_provider_config(provider: Optional[str] = None) -> Dict[str, Any]:
     return provider_config
 
 
+def get_rules_config() -> Dict[str, Any]:
+    """Get the fast-path rule settings, falling back to defaults for missing keys."""
+    config = load_config()
+    rules_config = dict(DEFAULT_CONFIG["Rules"])
+    if "Rules" in config:
+        rules_config.update(config["Rules"])
+    rules_config["enabled"] = str(rules_config["enabled"]).lower() == "true"
+    return rules_config
+
+
 def get_default_provider() -> str:
     """Get the currently configured default provider."""
     config = load_config()
@@ -0,0 +1,386 @@
+"""Host-wide metrics across cmscribe runs.
+
+Each run collects stage timings and counters in memory and appends one JSON
+line to ``metrics.jsonl`` in the cache directory when it finishes, which
+costs a single small write. The log rolls over to ``metrics.jsonl.1`` once it
+grows past ``MAX_LOG_BYTES``, so percentiles cover a bounded window of recent
+runs. Counters and histogram buckets are also folded into
+``metrics_totals.json``, which never rolls over, so the totals that
+``cmscribe stats`` exports for node_exporter's textfile collector only ever
+go up.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .cache import atomic_write_json
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+METRICS_FILE = "metrics.jsonl"
+TOTALS_FILE = "metrics_totals.json"
+MAX_LOG_BYTES = 4 * 1024 * 1024
+
+# Caches whose lookups are counted as ``<name>_cache_hits`` / ``<name>_cache_misses``
+CACHES = ["response", "diff"]
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0]
+TOKEN_BUCKETS = [16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384]
+
+
+class RunMetrics:
+    """Stage timings and counters for one cmscribe invocation."""
+
+    def __init__(self, command: str):
+        """Start timing a run of ``command``."""
+        self.command = command
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a stage; repeated or concurrent stages of the same name add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Add to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_record(self, **fields: Any) -> Dict[str, Any]:
+        """Build the log record for the finished run."""
+        return {
+            "ts": time.time(),
+            "command": self.command,
+            "duration": time.perf_counter() - self.started,
+            "stages": self.stages,
+            "counters": self.counters,
+            **fields,
+        }
+
+
+_current: Optional[RunMetrics] = None
+
+
+def start_run(command: str) -> RunMetrics:
+    """Start collecting metrics for this process's run."""
+    global _current
+    _current = RunMetrics(command)
+    return _current
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current run, if one was started."""
+    if _current is None:
+        yield
+    else:
+        with _current.stage(name):
+            yield
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Add to a counter of the current run, if one was started."""
+    if _current is not None:
+        _current.incr(name, value)
+
+
+def get_counter(name: str) -> int:
+    """Get a counter of the current run (0 if no run was started)."""
+    return _current.counters.get(name, 0) if _current is not None else 0
+
+
+def finish_run(cache_dir: Path, **fields: Any) -> None:
+    """Record the current run, with any extra ``fields``, and stop collecting."""
+    global _current
+    if _current is None:
+        return
+    record = _current.to_record(**fields)
+    record_run(cache_dir, record)
+    update_totals(cache_dir, record)
+    _current = None
+
+
+def get_metrics_path(cache_dir: Path) -> Path:
+    """Get the path to the run log."""
+    return cache_dir / METRICS_FILE
+
+
+def record_run(cache_dir: Path, record: Dict[str, Any]) -> None:
+    """Append one run to the log, rolling it over when it gets too big."""
+    path = get_metrics_path(cache_dir)
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    try:
+        if path.exists() and path.stat().st_size > MAX_LOG_BYTES:
+            os.replace(path, path.with_name(METRICS_FILE + ".1"))
+        with open(path, "a") as f:
+            f.write(line)
+    except OSError as e:
+        print(f"Warning: Failed to record metrics: {e}")
+
+
+def load_runs(cache_dir: Path) -> List[Dict[str, Any]]:
+    """Load the runs in the current window, oldest first, skipping unreadable lines."""
+    path = get_metrics_path(cache_dir)
+    runs = []
+    for log_file in (path.with_name(METRICS_FILE + ".1"), path):
+        try:
+            with open(log_file) as f:
+                for line in f:
+                    try:
+                        runs.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except OSError:
+            continue
+    return runs
+
+
+def get_totals_path(cache_dir: Path) -> Path:
+    """Get the path to the cumulative totals."""
+    return cache_dir / TOTALS_FILE
+
+
+@contextmanager
+def _totals_lock(cache_dir: Path) -> Iterator[None]:
+    """Serialize read-modify-write of the totals between concurrent runs."""
+    if fcntl is None:
+        yield
+        return
+    with open(get_totals_path(cache_dir).with_suffix(".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_totals(cache_dir: Path) -> Dict[str, Any]:
+    """Load the cumulative totals of every recorded run."""
+    totals = {
+        "runs": 0,
+        "outcomes": {},
+        "counters": {},
+        "fast_path_hits": 0,
+        "latency_histogram": _histogram([], LATENCY_BUCKETS),
+        "stage_histograms": {},
+        "completion_tokens_histogram": _histogram([], TOKEN_BUCKETS),
+    }
+    try:
+        with open(get_totals_path(cache_dir)) as f:
+            totals.update(json.load(f))
+    except (OSError, json.JSONDecodeError):
+        pass
+    return totals
+
+
+def update_totals(cache_dir: Path, record: Dict[str, Any]) -> None:
+    """Fold one run into the cumulative totals."""
+    try:
+        with _totals_lock(cache_dir):
+            totals = load_totals(cache_dir)
+            _add_run(totals, record)
+            atomic_write_json(get_totals_path(cache_dir), totals)
+    except OSError as e:
+        print(f"Warning: Failed to record metrics: {e}")
+
+
+def _add_run(totals: Dict[str, Any], record: Dict[str, Any]) -> None:
+    """Add one run record to the totals in place."""
+    for name, value in record.get("counters", {}).items():
+        totals["counters"][name] = totals["counters"].get(name, 0) + value
+    key = f"{record.get('command')}:{record.get('outcome', 'ok')}"
+    totals["outcomes"][key] = totals["outcomes"].get(key, 0) + 1
+    for name, value in record.get("stages", {}).items():
+        hist = totals["stage_histograms"].setdefault(name, _histogram([], LATENCY_BUCKETS))
+        _observe(hist, value)
+    if record.get("command") != "gen":
+        return
+    totals["runs"] += 1
+    totals["fast_path_hits"] += 1 if record.get("fast_path") else 0
+    _observe(totals["latency_histogram"], record.get("duration", 0.0))
+    completion_tokens = record.get("counters", {}).get("completion_tokens")
+    if completion_tokens:
+        _observe(totals["completion_tokens_histogram"], completion_tokens)
+
+
+def _observe(hist: Dict[str, Any], value: float) -> None:
+    """Add one observation to a histogram in place."""
+    hist["buckets"] = [
+        [bound, count + 1 if value <= bound else count] for bound, count in hist["buckets"]
+    ]
+    hist["sum"] += value
+    hist["count"] += 1
+
+
+def _histogram(values: List[float], buckets: List[float]) -> Dict[str, Any]:
+    """Cumulative bucket counts, sum and count for a list of observations."""
+    return {
+        "buckets": [(bound, sum(1 for v in values if v <= bound)) for bound in buckets],
+        "sum": sum(values),
+        "count": len(values),
+    }
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of observations."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate recorded runs into totals, percentiles and histograms."""
+    gen_runs = [run for run in runs if run.get("command") == "gen"]
+    counters: Dict[str, int] = {}
+    outcomes: Dict[str, int] = {}
+    stage_values: Dict[str, List[float]] = {}
+    for run in runs:
+        for name, value in run.get("counters", {}).items():
+            counters[name] = counters.get(name, 0) + value
+        key = f"{run.get('command')}:{run.get('outcome', 'ok')}"
+        outcomes[key] = outcomes.get(key, 0) + 1
+        for name, value in run.get("stages", {}).items():
+            stage_values.setdefault(name, []).append(value)
+
+    durations = [run.get("duration", 0.0) for run in gen_runs]
+    completion_tokens = [
+        run["counters"]["completion_tokens"]
+        for run in gen_runs
+        if run.get("counters", {}).get("completion_tokens")
+    ]
+    fast_path_hits = sum(1 for run in gen_runs if run.get("fast_path"))
+    cache_hit_ratios = {}
+    for cache in CACHES:
+        hits = counters.get(f"{cache}_cache_hits", 0)
+        lookups = hits + counters.get(f"{cache}_cache_misses", 0)
+        cache_hit_ratios[cache] = hits / lookups if lookups else 0.0
+    return {
+        "runs": len(gen_runs),
+        "outcomes": outcomes,
+        "counters": counters,
+        "fast_path_hits": fast_path_hits,
+        "fast_path_hit_rate": fast_path_hits / len(gen_runs) if gen_runs else 0.0,
+        "cache_hit_ratios": cache_hit_ratios,
+        "latency_p50": _percentile(durations, 0.5),
+        "latency_p95": _percentile(durations, 0.95),
+        "stage_p50": {name: _percentile(v, 0.5) for name, v in sorted(stage_values.items())},
+        "latency_histogram": _histogram(durations, LATENCY_BUCKETS),
+        "stage_histograms": {
+            name: _histogram(values, LATENCY_BUCKETS)
+            for name, values in sorted(stage_values.items())
+        },
+        "completion_tokens_histogram": _histogram(completion_tokens, TOKEN_BUCKETS),
+    }
+
+
+def format_openmetrics(totals: Dict[str, Any]) -> str:
+    """Render cumulative totals (see ``load_totals``) as a metrics textfile.
+
+    The output uses the Prometheus text format that node_exporter's textfile
+    collector reads, so counter families carry the ``_total`` suffix.
+    """
+    lines: List[str] = []
+
+    def histogram(name: str, help_text: str, series: Dict[str, Dict[str, Any]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, hist in series.items():
+            prefix = f"{labels}," if labels else ""
+            for bound, count in hist["buckets"]:
+                lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {hist["count"]}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {hist['sum']}")
+            lines.append(f"{name}_count{suffix} {hist['count']}")
+
+    def counter(name: str, help_text: str, samples: Dict[str, float]) -> None:
+        name = f"{name}_total"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in samples.items():
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}{suffix} {value}")
+
+    runs = {}
+    for key, count in sorted(totals["outcomes"].items()):
+        command, outcome = key.split(":", 1)
+        runs[f'command="{command}",outcome="{outcome}"'] = count
+    counter("cmscribe_runs", "Runs by command and outcome.", runs)
+
+    counters = totals["counters"]
+    counter(
+        "cmscribe_fast_path_hits",
+        "Messages produced by local rules.",
+        {"": totals["fast_path_hits"]},
+    )
+    counter(
+        "cmscribe_tokens",
+        "Tokens processed by the provider.",
+        {
+            'kind="prompt"': counters.get("prompt_tokens", 0),
+            'kind="completion"': counters.get("completion_tokens", 0),
+        },
+    )
+    counter(
+        "cmscribe_cache_lookups",
+        "Cache lookups by cache and result.",
+        {
+            f'cache="{cache}",result="{result}"': counters.get(f"{cache}_cache_{suffix}", 0)
+            for cache in CACHES
+            for result, suffix in (("hit", "hits"), ("miss", "misses"))
+        },
+    )
+    counter(
+        "cmscribe_provider_failures",
+        "Failed provider requests by kind.",
+        {
+            'kind="error"': counters.get("provider_errors", 0),
+            'kind="timeout"': counters.get("provider_timeouts", 0),
+        },
+    )
+    counter(
+        "cmscribe_noise_bytes_removed",
+        "Diff bytes left out of prompts as whitespace, line-ending or move noise.",
+        {"": counters.get("noise_bytes_removed", 0)},
+    )
+    counter(
+        "cmscribe_retries",
+        "Generation retries after failed output repair.",
+        {"": counters.get("retries", 0)},
+    )
+
+    histogram(
+        "cmscribe_gen_duration_seconds",
+        "End-to-end gen latency.",
+        {"": totals["latency_histogram"]},
+    )
+    histogram(
+        "cmscribe_stage_duration_seconds",
+        "Latency per pipeline stage.",
+        {f'stage="{name}"': hist for name, hist in sorted(totals["stage_histograms"].items())},
+    )
+    histogram(
+        "cmscribe_completion_tokens",
+        "Completion tokens per gen run.",
+        {"": totals["completion_tokens_histogram"]},
+    )
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,269 @@
+"""Diff noise reduction.
+
+Reformatting runs, line-ending flips and code that was moved without being
+changed make up much of a typical diff while telling the model little. This
+stage diffs each file with that noise folded away and notes what was folded
+in a single line, so the prompt only carries the real changes.
+"""
+
+import difflib
+import fnmatch
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .prompt import DELETED_FILE_MARKER, NEW_FILE_MARKER
+
+# Bump when the output changes, so cached results are not reused
+NORMALIZE_VERSION = 3
+
+# Smallest run of non-blank lines reported as a move rather than a delete and an add
+MIN_MOVED_LINES = 3
+
+# Upper bound on moved blocks reported per file
+MAX_MOVES = 20
+
+# Files where leading indentation is syntax, so re-indenting a line changes it
+INDENT_SENSITIVE = [
+    "*.py",
+    "*.pyi",
+    "*.pyx",
+    "*.yaml",
+    "*.yml",
+    "Makefile",
+    "GNUmakefile",
+    "*.mk",
+    "*.coffee",
+    "*.haml",
+    "*.pug",
+    "*.sass",
+]
+
+# Single-line string literals, whose spacing is content rather than layout
+_QUOTED = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`)""")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def is_indent_sensitive(file_path: str) -> bool:
+    """Check whether indentation is significant in a file."""
+    name = file_path.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(name, pattern) for pattern in INDENT_SENSITIVE)
+
+
+def _tokens(line: str) -> str:
+    """A line's tokens with the whitespace runs between them collapsed.
+
+    Quoted strings are kept as they are, since their spacing is part of the value.
+    """
+    parts = _QUOTED.split(line)
+    # re.split puts the quoted spans at the odd indexes
+    parts[::2] = [_WHITESPACE.sub(" ", part) for part in parts[::2]]
+    return "".join(parts).strip()
+
+
+def _indent(line: str) -> int:
+    """Width of a line's leading whitespace."""
+    return len(line[: len(line) - len(line.lstrip())].expandtabs(8))
+
+
+def _key(line: str, keep_indent: bool) -> str:
+    """Compare lines ignoring trailing whitespace and spacing between tokens.
+
+    Whitespace inside a token or a string literal is never touched, so
+    ``"a b"``, ``"ab"`` and ``"a  b"`` all stay different.
+    """
+    tokens = _tokens(line)
+    if keep_indent and tokens:
+        return line[: len(line) - len(line.lstrip())] + tokens
+    return tokens
+
+
+def _keys(lines: List[str], keep_indent: bool) -> List[str]:
+    """Whitespace-insensitive keys of the lines."""
+    return [_key(line, keep_indent) for line in lines]
+
+
+def _changed_bytes(lines: List[str]) -> int:
+    """Size of lines as they would appear in a diff, with prefix and newline."""
+    return sum(len(line) + 2 for line in lines)
+
+
+def _format_groups(
+    file_path: str, a: List[str], b: List[str], groups: List[List[Tuple]]
+) -> List[str]:
+    """Render grouped opcodes in unified diff format."""
+    if not groups:
+        return []
+    lines = [f"--- a/{file_path}", f"+++ b/{file_path}"]
+    for group in groups:
+        i1, i2, j1, j2 = group[0][1], group[-1][2], group[0][3], group[-1][4]
+        lines.append(f"@@ -{_range(i1, i2)} +{_range(j1, j2)} @@")
+        for tag, gi1, gi2, gj1, gj2 in group:
+            if tag == "equal":
+                lines.extend(" " + line for line in a[gi1:gi2])
+                continue
+            lines.extend("-" + line for line in a[gi1:gi2])
+            lines.extend("+" + line for line in b[gj1:gj2])
+    return lines
+
+
+def _range(start: int, stop: int) -> str:
+    """Format a hunk range the way ``diff -u`` does."""
+    length = stop - start
+    if length == 1:
+        return str(start + 1)
+    if not length:
+        start -= 1
+    return f"{start + 1},{length}"
+
+
+def _uniform_runs(removed: List[str], added: List[str]) -> List[Tuple[int, int, int]]:
+    """Split matched lines into runs that share one indentation change.
+
+    Returns ``(start, stop, delta)`` for each run; blank lines join the run
+    they are in.
+    """
+    runs: List[Tuple[int, int, int]] = []
+    start, delta = 0, None
+    for n, (old, new) in enumerate(zip(removed, added)):
+        if not old.strip():
+            continue
+        line_delta = _indent(new) - _indent(old)
+        if delta is not None and line_delta != delta:
+            runs.append((start, n, delta))
+            start = n
+        delta = line_delta
+    if delta is not None:
+        runs.append((start, len(removed), delta))
+    return runs
+
+
+def _find_moves(removed: List[str], added: List[str]) -> List[Tuple[range, range, int]]:
+    """Find runs of removed lines that reappear among the added lines.
+
+    Lines are matched on their tokens alone, and a match only counts as a
+    move where every line shifted by the same indentation. Moves cross each
+    other, which a single diff pass cannot express, so the longest remaining
+    run is taken repeatedly and masked out of the next search.
+    Returns ``(source lines, target lines, indentation change)`` per move.
+    """
+    removed_keys: List = [_tokens(line) for line in removed]
+    added_keys: List = [_tokens(line) for line in added]
+    moves = []
+    matcher = difflib.SequenceMatcher(None, autojunk=False)
+    for _ in range(MAX_MOVES):
+        matcher.set_seqs(removed_keys, added_keys)
+        i, j, size = matcher.find_longest_match(0, len(removed_keys), 0, len(added_keys))
+        if sum(1 for key in removed_keys[i : i + size] if key) < MIN_MOVED_LINES:
+            break
+        for start, stop, delta in _uniform_runs(
+            removed[i : i + size], added[j : j + size]
+        ):
+            if sum(1 for key in removed_keys[i + start : i + stop] if key) >= MIN_MOVED_LINES:
+                moves.append((range(i + start, i + stop), range(j + start, j + stop), delta))
+        # Unique placeholders so matched lines cannot match again
+        removed_keys[i : i + size] = [("-", n) for n in range(i, i + size)]
+        added_keys[j : j + size] = [("+", n) for n in range(j, j + size)]
+    return moves
+
+
+def normalized_diff(file_path: str, before: str, after: str) -> Tuple[str, int]:
+    """Diff two versions of a file with whitespace-only changes and moves folded away.
+
+    Only trailing whitespace, line endings and the spacing between tokens
+    count as whitespace-only; indentation does too, except in files where it
+    is syntax (see ``INDENT_SENSITIVE``). Returns the diff and the number of
+    bytes it saved over a plain unified diff.
+    """
+    a = [] if before == NEW_FILE_MARKER else before.splitlines()
+    b = [] if after == DELETED_FILE_MARKER else after.splitlines()
+    if a == b:
+        if before == after:
+            return "", 0
+        note = "(line endings changed only)"
+        return note, max(0, _changed_bytes(a) + _changed_bytes(b) - len(note))
+
+    keep_indent = is_indent_sensitive(file_path)
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    opcodes = matcher.get_opcodes()
+    raw_bytes = sum(
+        _changed_bytes(a[i1:i2]) + _changed_bytes(b[j1:j2])
+        for tag, i1, i2, j1, j2 in opcodes
+        if tag != "equal"
+    )
+
+    # Whitespace-only hunks are folded as a whole; the remaining removed and
+    # added lines are matched against each other to find moved blocks
+    whitespace_lines = 0
+    removed: List[int] = []
+    added: List[int] = []
+    folded_hunks = set()
+    for n, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == "equal":
+            continue
+        if _keys(a[i1:i2], keep_indent) == _keys(b[j1:j2], keep_indent):
+            whitespace_lines += i2 - i1
+            folded_hunks.add(n)
+        else:
+            removed.extend(range(i1, i2))
+            added.extend(range(j1, j2))
+
+    notes = []
+    if whitespace_lines:
+        notes.append(f"(whitespace-only changes in {whitespace_lines} lines omitted)")
+    kept, dropped = set(), set()
+    for sources, targets, delta in _find_moves([a[i] for i in removed], [b[j] for j in added]):
+        kept.update(removed[i] for i in sources)
+        dropped.update(added[j] for j in targets)
+        notes.append(
+            f"(moved {len(sources)} {'re-indented' if delta else 'unchanged'} lines "
+            f"from line {removed[sources[0]] + 1} to line {added[targets[0]] + 1})"
+        )
+
+    if not notes:
+        diff_lines = _format_groups(file_path, a, b, list(matcher.get_grouped_opcodes(3)))
+        return "\n".join(diff_lines), 0
+
+    # Rebuild the new version with the noise undone, then diff what is left
+    folded: List[str] = []
+    for n, (tag, i1, i2, j1, j2) in enumerate(opcodes):
+        if tag == "equal" or n in folded_hunks:
+            folded.extend(a[i1:i2])
+        else:
+            folded.extend(a[i] for i in range(i1, i2) if i in kept)
+            folded.extend(b[j] for j in range(j1, j2) if j not in dropped)
+
+    folded_matcher = difflib.SequenceMatcher(None, a, folded, autojunk=False)
+    diff_lines = notes + _format_groups(
+        file_path, a, folded, list(folded_matcher.get_grouped_opcodes(3))
+    )
+    kept_bytes = sum(
+        len(line) + 1
+        for line in diff_lines
+        if line[:1] in "+-(" and line[:3] not in ("---", "+++")
+    )
+    return "\n".join(diff_lines), max(0, raw_bytes - kept_bytes)
+
+
+def omitted_diff(reason: str, before: str, after: str) -> Tuple[str, int]:
+    """Stand-in for the diff of a file marked as generated or not diffable.
+
+    The saving is estimated from the lines unique to either version, which is
+    what a plain diff would have carried.
+    """
+    a = [] if before == NEW_FILE_MARKER else before.splitlines()
+    b = [] if after == DELETED_FILE_MARKER else after.splitlines()
+    a_lines, b_lines = set(a), set(b)
+    raw_bytes = _changed_bytes([line for line in a if line not in b_lines]) + _changed_bytes(
+        [line for line in b if line not in a_lines]
+    )
+    note = f"({reason}, diff omitted)"
+    return note, max(0, raw_bytes - len(note))
+
+
+def omission_reason(attributes: Dict[str, str]) -> Optional[str]:
+    """Get why a file's diff should be left out, from its ``.gitattributes``."""
+    if attributes.get("linguist-generated") in ("set", "true"):
+        return "generated file"
+    if attributes.get("diff") == "unset":
+        return "marked -diff in .gitattributes"
+    return None
@@ -0,0 +1,184 @@
+"""Structured output grammars, validation and repair for commit messages.
+
+Each ``CommitFormat`` has a JSON schema that providers with structured output
+(e.g. Ollama's ``format`` field) use to constrain generation. The model fills
+in fields and the message is rendered locally, so the layout is always right.
+Output that still deviates (truncated JSON, free text with a preamble or code
+fences) is repaired locally before anyone considers another round trip.
+"""
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+from .types import CommitFormat
+
+MAX_SUBJECT_LENGTH = 72
+
+COMMIT_TYPES = {
+    CommitFormat.CONVENTIONAL: ["feat", "fix", "chore", "refactor", "docs", "test", "ci", "build"],
+    CommitFormat.SEMANTIC: ["major", "minor", "patch"],
+    CommitFormat.SIMPLE: [],
+    CommitFormat.ANGULAR: [
+        "feat",
+        "fix",
+        "docs",
+        "style",
+        "refactor",
+        "perf",
+        "test",
+        "build",
+        "ci",
+        "chore",
+        "revert",
+    ],
+}
+
+# Structured output keeps newlines inside strings escaped, so a raw blank-line
+# run can only be whitespace padding after the object; stop there instead of
+# burning the token budget on it.
+STOP_SEQUENCES = ["\n\n\n"]
+
+_SUBJECT_PATTERNS = {
+    CommitFormat.CONVENTIONAL: re.compile(r"^(?P<type>[a-z]+)(\([\w./-]+\))?!?: \S.*$"),
+    CommitFormat.SEMANTIC: re.compile(r"^(?P<type>[a-z]+): \S.*$"),
+    CommitFormat.SIMPLE: re.compile(r"^\S.*$"),
+    CommitFormat.ANGULAR: re.compile(r"^(?P<type>[a-z]+)(\([\w./-]+\))?!?: \S.*$"),
+}
+
+_PREAMBLE = re.compile(
+    r"^\s*(here\s+is|here's|sure|certainly|okay|ok)\b.*$"
+    r"|^\s*(suggested\s+)?commit\s+message\s*:?\s*$",
+    re.IGNORECASE,
+)
+_FENCE = re.compile(r"^\s*```")
+_JSON_STRING_FIELD = r'"{}"\s*:\s*"((?:[^"\\]|\\.)*)(")?'
+_SCOPE = r"^[\w./-]+$"
+_SCOPE_INVALID = re.compile(r"[^\w./-]+")
+
+
+def output_schema(commit_format: CommitFormat) -> Dict[str, Any]:
+    """Get the JSON schema that constrains output for a commit format."""
+    properties: Dict[str, Any] = {}
+    required = []
+    types = COMMIT_TYPES[commit_format]
+    if types:
+        properties["type"] = {"type": "string", "enum": types}
+        required.append("type")
+    if commit_format in (CommitFormat.CONVENTIONAL, CommitFormat.ANGULAR):
+        properties["scope"] = {"type": "string", "pattern": _SCOPE}
+    properties["description"] = {"type": "string", "maxLength": MAX_SUBJECT_LENGTH}
+    properties["body"] = {"type": "string"}
+    required.append("description")
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def schema_instructions(commit_format: CommitFormat) -> str:
+    """Describe the structured output fields, for the static system prefix."""
+    fields = ", ".join(output_schema(commit_format)["properties"])
+    return (
+        f"Respond with a JSON object with the fields: {fields}. "
+        f"Keep the description under {MAX_SUBJECT_LENGTH} characters; the body is optional."
+    )
+
+
+def render_message(fields: Dict[str, Any], commit_format: CommitFormat) -> str:
+    """Render structured fields as a commit message."""
+    description = str(fields.get("description", "")).strip().rstrip(".")
+    commit_type = str(fields.get("type", "")).strip().lower()
+    # "my scope" -> "my-scope", so a loose scope does not fail validation
+    scope = _SCOPE_INVALID.sub("-", str(fields.get("scope", "") or "").strip()).strip("-")
+
+    if commit_format in (CommitFormat.CONVENTIONAL, CommitFormat.ANGULAR):
+        scope = f"({scope})" if scope else ""
+        subject = f"{commit_type}{scope}: {description}"
+    elif commit_format == CommitFormat.SEMANTIC:
+        subject = f"{commit_type}: {description}"
+    else:
+        subject = description
+
+    body = str(fields.get("body", "") or "").strip()
+    return f"{_truncate(subject)}\n\n{body}" if body else _truncate(subject)
+
+
+def validate_message(message: str, commit_format: CommitFormat) -> bool:
+    """Check that a message's subject line matches the commit format."""
+    if not message:
+        return False
+    subject = message.splitlines()[0]
+    if len(subject) > MAX_SUBJECT_LENGTH or "`" in subject:
+        return False
+    match = _SUBJECT_PATTERNS[commit_format].match(subject)
+    if not match:
+        return False
+    types = COMMIT_TYPES[commit_format]
+    return not types or match.group("type") in types
+
+
+def parse_output(raw: str, commit_format: CommitFormat) -> Optional[str]:
+    """Turn raw model output into a valid commit message, or None if unrepairable."""
+    unfenced = "\n".join(line for line in raw.splitlines() if not _FENCE.match(line))
+    fields = _parse_fields(unfenced)
+    if fields is not None:
+        message = render_message(fields, commit_format)
+        if validate_message(message, commit_format):
+            return message
+    return repair_message(raw, commit_format)
+
+
+def repair_message(raw: str, commit_format: CommitFormat) -> Optional[str]:
+    """Fix common deviations in free-text output: preambles, fences, quotes, casing."""
+    lines = [line for line in raw.strip().splitlines() if not _FENCE.match(line)]
+    # Preambles only come before the message; the body may start the same way
+    while lines and (not lines[0].strip() or _PREAMBLE.match(lines[0])):
+        lines.pop(0)
+    if not lines:
+        return None
+
+    subject = lines[0].strip().strip("\"'`").strip()
+    subject = re.sub(r"^[*#>\s-]+", "", subject).rstrip(".")
+    # "Feat(API): ..." -> "feat(API): ..."
+    subject = re.sub(r"^([A-Za-z]+)(?=(\([^)]*\))?!?:)", lambda m: m.group(1).lower(), subject)
+    subject = _truncate(subject)
+
+    body = "\n".join(lines[1:]).strip().strip("\"'`").strip()
+    message = f"{subject}\n\n{body}" if body else subject
+    return message if validate_message(message, commit_format) else None
+
+
+def _parse_fields(raw: str) -> Optional[Dict[str, Any]]:
+    """Parse structured fields, salvaging what we can from truncated JSON."""
+    text = raw.strip()
+    if not text.startswith("{"):
+        return None
+    try:
+        fields = json.loads(text)
+        return fields if isinstance(fields, dict) else None
+    except json.JSONDecodeError:
+        pass
+
+    # Output cut off by the token limit: pull out the string fields that made it.
+    # A field cut mid-value keeps only its complete words; a type or scope cut
+    # short cannot be trusted at all.
+    fields = {}
+    for name in ("type", "scope", "description", "body"):
+        match = re.search(_JSON_STRING_FIELD.format(name), text)
+        if not match:
+            continue
+        value = match.group(1)
+        if not match.group(2):
+            if name in ("type", "scope") or not re.search(r"\s", value):
+                continue
+            value = re.split(r"\s+(?=\S*$)", value)[0]
+        try:
+            fields[name] = json.loads(f'"{value}"')
+        except json.JSONDecodeError:
+            fields[name] = value
+    return fields if fields.get("description") else None
+
+
+def _truncate(subject: str) -> str:
+    """Shorten a subject line to the maximum length at a word boundary."""
+    if len(subject) <= MAX_SUBJECT_LENGTH:
+        return subject
+    return subject[:MAX_SUBJECT_LENGTH].rsplit(" ", 1)[0].rstrip(" ,;:")
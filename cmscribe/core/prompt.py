@@ -0,0 +1,126 @@
+"""Prompt assembly shared by providers.
+
+Prompts are split into a static system prefix, which depends only on the
+commit format, and the volatile change content, which always comes last.
+Servers that cache the key/value state of a prompt prefix (e.g. Ollama) can
+then reuse the prefix across regenerations and batch runs against the same
+model. Rendering is deterministic: files are sorted and formatting never
+depends on dict order, timestamps or the environment.
+"""
+
+import difflib
+from typing import Dict, NamedTuple
+
+from .output import schema_instructions
+from .types import CommitFormat
+
+NEW_FILE_MARKER = "<new file, no prior content>"
+DELETED_FILE_MARKER = "<file deleted>"
+
+SYSTEM_PREAMBLE = (
+    "You write git commit messages. You are given the changes to a "
+    "repository as unified diffs, one file at a time. Reply with the commit "
+    "message only: no preamble, no explanation, no code fences."
+)
+
+# Used instead of SYSTEM_PREAMBLE when output is constrained to a JSON schema
+STRUCTURED_PREAMBLE = (
+    "You write git commit messages. You are given the changes to a "
+    "repository as unified diffs, one file at a time. Reply with a single "
+    "JSON object describing the commit and nothing else."
+)
+
+FORMAT_INSTRUCTIONS = {
+    CommitFormat.CONVENTIONAL: (
+        "Generate a commit message following the Conventional Commits format.\n"
+        "Types: feat, fix, chore, refactor, docs, test, ci, build\n"
+        "Use the imperative mood in the description (e.g., 'fix bug', not 'fixed bug')."
+    ),
+    CommitFormat.SEMANTIC: (
+        "Generate a commit message following Semantic Versioning.\n"
+        "Types: major, minor, patch"
+    ),
+    CommitFormat.SIMPLE: "Generate a simple commit message.",
+    CommitFormat.ANGULAR: (
+        "Generate a commit message following the Angular commit format.\n"
+        "Types: feat, fix, docs, style, refactor, perf, test, build, ci, chore, revert"
+    ),
+}
+
+# Layout of a free-text message; structured output describes fields instead
+FORMAT_LAYOUTS = {
+    CommitFormat.CONVENTIONAL: "Format: <type>(<scope>): <description>",
+    CommitFormat.SEMANTIC: "Format: <type>: <description>",
+    CommitFormat.SIMPLE: "Format: <description>",
+    CommitFormat.ANGULAR: "Format: <type>(<scope>): <description>",
+}
+
+
+class Prompt(NamedTuple):
+    """A prompt split into its static prefix and volatile suffix."""
+
+    system: str
+    prompt: str
+
+
+def build_system_prompt(commit_format: CommitFormat, structured: bool = False) -> str:
+    """Build the static system prefix for a commit format.
+
+    With ``structured`` the output directives describe the JSON fields of
+    ``output_schema`` instead of a free-text layout, so the two never conflict.
+    """
+    if structured:
+        return (
+            f"{STRUCTURED_PREAMBLE}\n\n{FORMAT_INSTRUCTIONS[commit_format]}\n"
+            f"{schema_instructions(commit_format)}"
+        )
+    return (
+        f"{SYSTEM_PREAMBLE}\n\n{FORMAT_INSTRUCTIONS[commit_format]}\n"
+        f"{FORMAT_LAYOUTS[commit_format]}"
+    )
+
+
+def unified_diff(file_path: str, before: str, after: str) -> str:
+    """Compute the unified diff between two versions of a file."""
+    if before == NEW_FILE_MARKER:
+        before = ""
+    if after == DELETED_FILE_MARKER:
+        after = ""
+    diff = difflib.unified_diff(
+        before.splitlines(),
+        after.splitlines(),
+        fromfile=f"a/{file_path}",
+        tofile=f"b/{file_path}",
+        lineterm="",
+    )
+    return "\n".join(diff)
+
+
+def render_file(file_path: str, entry: Dict[str, str]) -> str:
+    """Render one file's change, using its precomputed ``diff`` if there is one."""
+    if entry["before"] == NEW_FILE_MARKER:
+        header = f"File: {file_path} (new file)"
+    elif entry["after"] == DELETED_FILE_MARKER:
+        header = f"File: {file_path} (deleted)"
+    else:
+        header = f"File: {file_path}"
+    diff = entry.get("diff")
+    if diff is None:
+        diff = unified_diff(file_path, entry["before"], entry["after"])
+    return f"{header}\n{diff}"
+
+
+def render_changes(content: Dict[str, Dict[str, str]]) -> str:
+    """Render all changed files in a stable, sorted order."""
+    return "\n\n".join(render_file(path, content[path]) for path in sorted(content))
+
+
+def build_prompt(
+    content: Dict[str, Dict[str, str]], commit_format: CommitFormat, structured: bool = False
+) -> Prompt:
+    """Build a prefix-stable prompt for the given before/after file content."""
+    changes = f"Here are the changes:\n{render_changes(content)}"
+    return Prompt(
+        system=build_system_prompt(commit_format, structured),
+        prompt=changes if structured else f"{changes}\n\nCommit message:",
+    )
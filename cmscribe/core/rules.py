@@ -0,0 +1,264 @@
+"""Deterministic fast path for trivial changes.
+
+Lockfile bumps, docs-only edits, pure renames and version bumps get their
+commit message from local rules instead of a model round trip. Anything the
+rules do not fully explain falls through to the provider.
+"""
+
+import difflib
+import fnmatch
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .output import render_message, validate_message
+from .types import CommitFormat
+
+# (status, old_path, new_path) as reported by ``git diff --name-status``
+Change = Tuple[str, str, str]
+
+_WILDCARDS = re.compile(r"[*?\[]")
+_VERSION_LINE = re.compile(
+    r"""^\s*["']?(?:__version__|version|VERSION)["']?\s*[:=]\s*["']?"""
+    r"""(?P<version>\d+(?:\.\d+)+[\w.+-]*)"""
+    r"""|^\s*v?(?P<bare>\d+(?:\.\d+)+[\w.+-]*)\s*$"""
+)
+_TOML_TABLE = re.compile(r"^\s*\[\[?\s*(?P<name>[^\]]+?)\s*\]\]?\s*(#.*)?$")
+
+# TOML tables whose ``version`` key is the project's own version; outside any
+# table (None) covers files such as ``__init__.py`` and ``package.json``
+_VERSION_TABLES = {None, "project", "tool.poetry"}
+
+
+def parse_patterns(value: str) -> List[str]:
+    """Parse a comma-separated pattern list from the config file."""
+    return [pattern.strip() for pattern in value.split(",") if pattern.strip()]
+
+
+class PathIndex:
+    """Classifies paths against labelled glob patterns.
+
+    Patterns are sorted by shape when the index is built: exact file names and
+    single ``*.ext`` suffixes go in dicts, ``dir/*`` prefixes in a trie keyed by path
+    segment, and everything else in one combined regex per match target, so
+    classifying a path costs a handful of lookups regardless of pattern count.
+    """
+
+    def __init__(self, patterns: Dict[str, Iterable[str]]):
+        """Build the index from ``{label: [pattern, ...]}``."""
+        self._names: Dict[str, str] = {}
+        self._extensions: Dict[str, str] = {}
+        self._prefixes: Dict[str, dict] = {}
+        name_globs: List[Tuple[str, str]] = []
+        path_globs: List[Tuple[str, str]] = []
+
+        for label, label_patterns in patterns.items():
+            for pattern in label_patterns:
+                if not _WILDCARDS.search(pattern) and "/" not in pattern:
+                    self._names.setdefault(pattern, label)
+                elif (
+                    pattern.startswith("*.")
+                    and "/" not in pattern
+                    and "." not in pattern[2:]
+                    and not _WILDCARDS.search(pattern[1:])
+                ):
+                    self._extensions.setdefault(pattern[1:], label)
+                elif pattern.endswith("/*") and not _WILDCARDS.search(pattern[:-2]):
+                    node = self._prefixes
+                    for segment in pattern[:-2].strip("/").split("/"):
+                        node = node.setdefault(segment, {})
+                    node.setdefault(None, label)
+                elif "/" in pattern:
+                    path_globs.append((label, fnmatch.translate(pattern)))
+                else:
+                    name_globs.append((label, fnmatch.translate(pattern)))
+
+        self._name_globs, self._name_labels = self._compile(name_globs)
+        self._path_globs, self._path_labels = self._compile(path_globs)
+
+    @staticmethod
+    def _compile(globs: List[Tuple[str, str]]) -> Tuple[Optional[re.Pattern], List[str]]:
+        """Combine translated globs into one regex with a group per pattern."""
+        if not globs:
+            return None, []
+        regex = "|".join(f"(?P<g{i}>{translated})" for i, (_, translated) in enumerate(globs))
+        return re.compile(regex), [label for label, _ in globs]
+
+    def classify(self, path: str) -> Optional[str]:
+        """Get the label of the first pattern kind that matches a path."""
+        *dirs, name = path.split("/")
+        if name in self._names:
+            return self._names[name]
+
+        node = self._prefixes
+        for segment in dirs:
+            node = node.get(segment)
+            if node is None:
+                break
+            if None in node:
+                return node[None]
+
+        dot = name.rfind(".")
+        if dot > 0 and name[dot:] in self._extensions:
+            return self._extensions[name[dot:]]
+
+        for regex, labels, target in (
+            (self._name_globs, self._name_labels, name),
+            (self._path_globs, self._path_labels, path),
+        ):
+            match = regex.match(target) if regex else None
+            if match:
+                return labels[int(match.lastgroup[1:])]
+        return None
+
+
+class RuleEngine:
+    """Produces commit messages for changes that need no model."""
+
+    def __init__(self, patterns: Dict[str, Iterable[str]]):
+        """Initialize the engine with ``deps``, ``docs`` and ``version`` patterns."""
+        self.index = PathIndex(patterns)
+
+    @classmethod
+    def from_config(cls, rules_config: Dict[str, str]) -> "RuleEngine":
+        """Create an engine from the ``[Rules]`` config section."""
+        return cls(
+            {
+                label: parse_patterns(rules_config.get(label, ""))
+                for label in ("deps", "docs", "version")
+            }
+        )
+
+    def match(
+        self,
+        changes: List[Change],
+        commit_format: CommitFormat,
+        load_content: Callable[[List[str]], Dict[str, Dict[str, str]]],
+    ) -> Optional[str]:
+        """Get a commit message for the changes, or None to fall through to the model.
+
+        ``load_content`` is only called, for the version files, when every
+        changed path could be part of a version bump.
+        """
+        if not changes:
+            return None
+        fields = (
+            self._match_renames(changes)
+            or self._match_labels(changes)
+            or self._match_version(changes, load_content)
+        )
+        if fields is None:
+            return None
+
+        if commit_format == CommitFormat.SEMANTIC:
+            fields["type"] = "patch"
+        elif commit_format == CommitFormat.SIMPLE:
+            description = fields["description"]
+            fields["description"] = description[:1].upper() + description[1:]
+        message = render_message(fields, commit_format)
+        return message if validate_message(message, commit_format) else None
+
+    def _match_renames(self, changes: List[Change]) -> Optional[Dict[str, str]]:
+        """Pure renames: every change moves a file without touching its content."""
+        if not all(status == "R100" for status, _, _ in changes):
+            return None
+        if len(changes) == 1:
+            _, old_path, new_path = changes[0]
+            description = f"rename {old_path} to {new_path}"
+            if len(description) > 60:
+                old_name, new_name = old_path.rsplit("/", 1)[-1], new_path.rsplit("/", 1)[-1]
+                description = f"rename {old_name} to {new_name}"
+        else:
+            description = f"rename {len(changes)} files"
+        return {"type": "refactor", "description": description}
+
+    def _match_labels(self, changes: List[Change]) -> Optional[Dict[str, str]]:
+        """Dependency-only and docs-only changes."""
+        labels = {self.index.classify(new_path) for _, _, new_path in changes}
+        if labels == {"deps"}:
+            return {
+                "type": "chore",
+                "scope": "deps",
+                "description": f"{_verb(changes)} {_describe(changes, 'dependencies')}",
+            }
+        if labels == {"docs"}:
+            return {
+                "type": "docs",
+                "description": f"{_verb(changes)} {_describe(changes, 'documentation')}",
+            }
+        return None
+
+    def _match_version(
+        self,
+        changes: List[Change],
+        load_content: Callable[[List[str]], Dict[str, Dict[str, str]]],
+    ) -> Optional[Dict[str, str]]:
+        """Version bumps: only version lines change, optionally alongside lockfiles."""
+        version_paths = []
+        for status, _, new_path in changes:
+            label = self.index.classify(new_path)
+            if label == "version" and status == "M":
+                version_paths.append(new_path)
+            elif label != "deps":
+                return None
+        if not version_paths:
+            return None
+
+        versions = set()
+        content = load_content(version_paths)
+        for path in version_paths:
+            before = content[path]["before"].splitlines()
+            after = content[path]["after"].splitlines()
+            matcher = difflib.SequenceMatcher(None, before, after, autojunk=False)
+            tables_before, tables_after = _tables(before), _tables(after)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag == "equal":
+                    continue
+                for i in range(i1, i2):
+                    if tables_before[i] not in _VERSION_TABLES:
+                        return None
+                    if not _VERSION_LINE.match(before[i]):
+                        return None
+                for j in range(j1, j2):
+                    match = _VERSION_LINE.match(after[j])
+                    if tables_after[j] not in _VERSION_TABLES or not match:
+                        return None
+                    versions.add(match.group("version") or match.group("bare"))
+        if len(versions) != 1:
+            return None
+        return {
+            "type": "chore",
+            "scope": "release",
+            "description": f"bump version to {versions.pop()}",
+        }
+
+
+def _tables(lines: List[str]) -> List[Optional[str]]:
+    """Get the TOML table each line belongs to (None before the first header)."""
+    tables: List[Optional[str]] = []
+    table = None
+    for line in lines:
+        match = _TOML_TABLE.match(line)
+        if match:
+            table = match.group("name")
+        tables.append(table)
+    return tables
+
+
+def _verb(changes: List[Change]) -> str:
+    """Describe what happened to the files: added, removed, or anything else."""
+    kinds = {status[:1] for status, _, _ in changes}
+    if kinds <= {"A", "C"}:
+        return "add"
+    if kinds == {"D"}:
+        return "remove"
+    return "update"
+
+
+def _describe(changes: List[Change], fallback: str) -> str:
+    """Name up to two changed files, or fall back to a collective noun."""
+    names = [new_path.rsplit("/", 1)[-1] for _, _, new_path in changes]
+    if len(names) == 1:
+        return names[0]
+    if len(names) == 2 and names[0] != names[1]:
+        return f"{names[0]} and {names[1]}"
+    return fallback
@@ -0,0 +1,127 @@
+"""Cross-process coalescing of identical generation requests.
+
+Editor integrations and git hooks often run ``cmscribe gen`` several times
+for the same staged state. The first process to take a request key's lock
+generates the message and hands it off through the response cache; the
+others wait for the lock and then reuse that result instead of hitting the
+model again.
+
+Locks are OS file locks (``flock``, or ``msvcrt.locking`` on Windows), which
+the kernel drops when their holder exits, so a crashed process never leaves
+a lock behind that someone has to detect and break.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import IO, Callable, Optional, Tuple
+
+from . import metrics
+from .cache import CacheManager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# (message, error) as returned by providers
+Result = Tuple[Optional[str], Optional[str]]
+
+
+class SingleFlight:
+    """Runs at most one generation per request key across processes."""
+
+    def __init__(self, cache_manager: CacheManager, poll_interval: float = 0.1):
+        """Initialize with the cache to hand results off through."""
+        self.cache_manager = cache_manager
+        self.lock_dir = cache_manager.cache_dir / "locks"
+        self.lock_dir.mkdir(exist_ok=True)
+        self.poll_interval = poll_interval
+
+    def run(
+        self,
+        key: str,
+        generate: Callable[[], Result],
+        save: Callable[[str], None],
+        reuse_cached: bool = False,
+    ) -> Result:
+        """Get the result for ``key``, generating it only if nobody else is.
+
+        ``save`` stores a successful result in the response cache. With
+        ``reuse_cached`` any earlier result for the key is returned as is;
+        otherwise only results finished while this call waited are reused.
+        """
+        started = time.time()
+        lock_path = self.lock_dir / f"{key}.lock"
+        while True:
+            message = self._cached(key, started, reuse_cached)
+            if message is not None:
+                metrics.incr("response_cache_hits")
+                return message, None
+
+            lock_file = self._acquire(lock_path)
+            if lock_file is None:
+                # Another process is generating the same message
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                # The previous holder may have finished just before we got the lock
+                message = self._cached(key, started, reuse_cached)
+                if message is not None:
+                    metrics.incr("response_cache_hits")
+                    return message, None
+                metrics.incr("response_cache_misses")
+                message, err = generate()
+                if message:
+                    save(message)
+                return message, err
+            finally:
+                self._release(lock_path, lock_file)
+
+    def _cached(self, key: str, started: float, reuse_cached: bool) -> Optional[str]:
+        """Get a cached message for the key that this call may reuse."""
+        response = self.cache_manager.get_response(key)
+        if response and (reuse_cached or response.get("created_at", 0) >= started):
+            return response["message"]
+        return None
+
+    def _acquire(self, lock_path: Path) -> Optional[IO]:
+        """Try to lock the key without blocking. Returns the open lock file, or None."""
+        lock_file = open(lock_path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return None
+        # The previous holder removes the file on release; a lock taken on
+        # the removed file excludes nobody, so it does not count
+        if fcntl is not None and not self._is_current(lock_path, lock_file):
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _release(self, lock_path: Path, lock_file: IO) -> None:
+        """Remove the lock file (while still holding it) and unlock."""
+        try:
+            if fcntl is not None:
+                lock_path.unlink()
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+        finally:
+            lock_file.close()
+
+    @staticmethod
+    def _is_current(lock_path: Path, lock_file: IO) -> bool:
+        """Check that an open lock file is still the one at ``lock_path``."""
+        try:
+            return os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
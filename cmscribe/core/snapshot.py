@@ -0,0 +1,172 @@
+"""Portable cache snapshots.
+
+``cmscribe cache export`` packs the cache into one gzip-compressed tar
+archive and ``cmscribe cache import`` merges it back, so ephemeral CI
+runners can restore a warm cache from a build artifact with a single
+sequential read. The archive starts with a versioned ``manifest.json``
+describing every entry, which lets import filter and resolve conflicts
+before touching the file contents.
+"""
+
+import io
+import json
+import re
+import tarfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .cache import CacheManager, atomic_write_json
+
+ARCHIVE_FORMAT = "cmscribe-cache"
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# Cache entries that are worth carrying between machines, relative to the
+# cache directory. Locks, run metrics and rewrite checkpoints stay local.
+SNAPSHOT_GLOBS = ["*.json", "responses/*.json", "diffs/*.json"]
+
+_ENTRY_PATH = re.compile(r"^(responses/|diffs/)?[0-9a-f]+\.json$")
+
+
+class SnapshotError(Exception):
+    """Raised when an archive cannot be written, or read as a cache snapshot."""
+
+
+def _matches(
+    meta: Dict[str, Any],
+    repo: Optional[str],
+    provider: Optional[str],
+    model: Optional[str],
+) -> bool:
+    """Check an entry's metadata against the requested filters.
+
+    Entries without a field (e.g. normalized diffs have no provider or model)
+    do not depend on it, so they match any filter on it.
+    """
+    return all(
+        wanted is None or meta.get(field) in (None, wanted)
+        for field, wanted in (("repo", repo), ("provider", provider), ("model", model))
+    )
+
+
+def _entry_meta(relative_path: str, data: Dict[str, Any], mtime: float) -> Dict[str, Any]:
+    """Build the manifest record for one cache entry."""
+    return {
+        "path": relative_path,
+        "repo": data.get("repo"),
+        "provider": data.get("provider"),
+        "model": data.get("model"),
+        "updated_at": data.get("updated_at") or data.get("created_at") or mtime,
+    }
+
+
+def _iter_entries(cache_manager: CacheManager) -> Iterator[Tuple[Dict[str, Any], bytes]]:
+    """Yield ``(manifest record, raw bytes)`` for every snapshot-able entry."""
+    for pattern in SNAPSHOT_GLOBS:
+        for entry_file in sorted(cache_manager.cache_dir.glob(pattern)):
+            relative_path = entry_file.relative_to(cache_manager.cache_dir).as_posix()
+            if not _ENTRY_PATH.match(relative_path):
+                continue
+            try:
+                raw = entry_file.read_bytes()
+                data = json.loads(raw)
+            except (OSError, json.JSONDecodeError):
+                continue
+            if isinstance(data, dict):
+                yield _entry_meta(relative_path, data, entry_file.stat().st_mtime), raw
+
+
+def export_cache(
+    cache_manager: CacheManager,
+    archive_path: Path,
+    repo: Optional[str] = None,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+) -> int:
+    """Pack matching cache entries into an archive. Returns the entry count."""
+    entries = [
+        (meta, raw)
+        for meta, raw in _iter_entries(cache_manager)
+        if _matches(meta, repo, provider, model)
+    ]
+    manifest = {
+        "format": ARCHIVE_FORMAT,
+        "version": ARCHIVE_VERSION,
+        "created_at": time.time(),
+        "entries": [meta for meta, _ in entries],
+    }
+
+    try:
+        with tarfile.open(archive_path, "w:gz", compresslevel=6) as archive:
+            _add_member(archive, MANIFEST_NAME, json.dumps(manifest).encode())
+            for meta, raw in entries:
+                _add_member(archive, meta["path"], raw, mtime=meta["updated_at"])
+    except (tarfile.TarError, OSError) as e:
+        # Do not leave a truncated archive behind for CI to upload
+        try:
+            archive_path.unlink()
+        except OSError:
+            pass
+        raise SnapshotError(f"failed to write {archive_path}: {e}") from e
+    return len(entries)
+
+
+def import_cache(
+    cache_manager: CacheManager,
+    archive_path: Path,
+    repo: Optional[str] = None,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+) -> Tuple[int, int]:
+    """Merge an archive into the cache, keeping the newer side of each conflict.
+
+    The archive is streamed in a single pass. Returns ``(imported, skipped)``.
+    """
+    local = {meta["path"]: meta["updated_at"] for meta, _ in _iter_entries(cache_manager)}
+    imported = skipped = 0
+
+    try:
+        with tarfile.open(archive_path, "r|gz") as archive:
+            members = iter(archive)
+            manifest_member = next(members, None)
+            if manifest_member is None or manifest_member.name != MANIFEST_NAME:
+                raise SnapshotError("archive does not start with a cache manifest")
+            manifest = json.load(archive.extractfile(manifest_member))
+            if manifest.get("format") != ARCHIVE_FORMAT:
+                raise SnapshotError("not a cmscribe cache archive")
+            if manifest.get("version", 0) > ARCHIVE_VERSION:
+                raise SnapshotError(
+                    f"archive version {manifest['version']} is newer than supported "
+                    f"version {ARCHIVE_VERSION}; upgrade cmscribe"
+                )
+            wanted = {
+                meta["path"]: meta
+                for meta in manifest.get("entries", [])
+                if _ENTRY_PATH.match(meta.get("path", ""))
+                and _matches(meta, repo, provider, model)
+            }
+
+            for member in members:
+                meta = wanted.get(member.name)
+                if meta is None or not member.isfile():
+                    continue
+                if local.get(member.name, 0) >= meta["updated_at"]:
+                    skipped += 1
+                    continue
+                data = json.load(archive.extractfile(member))
+                target = cache_manager.cache_dir / member.name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write_json(target, data)
+                imported += 1
+    except (tarfile.TarError, json.JSONDecodeError, EOFError, OSError) as e:
+        raise SnapshotError(f"failed to read {archive_path}: {e}") from e
+    return imported, skipped
+
+
+def _add_member(archive: tarfile.TarFile, name: str, data: bytes, mtime: float = 0) -> None:
+    """Add an in-memory file to the archive."""
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime or time.time())
+    archive.addfile(info, io.BytesIO(data))
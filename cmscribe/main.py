@@ -2,9 +2,23 @@
 
 import argparse
 import json
+from pathlib import Path
+
 from cmscribe import __version__
-from cmscribe.core import CacheManager, get_default_provider
-from cmscribe.utils import process_create_config, process_gen_command, process_update_config
+from cmscribe.core import (
+    CacheManager,
+    SnapshotError,
+    export_cache,
+    get_default_provider,
+    import_cache,
+)
+from cmscribe.utils import (
+    process_create_config,
+    process_gen_command,
+    process_rewrite_command,
+    process_stats_command,
+    process_update_config,
+)
 
 
 def main():
@@ -43,7 +57,84 @@ def main():
         "--clear-context",
         "-cc",
         action="store_true",
-        help="Clear context cache before generation",
+        help="Clear cached context and messages for this provider before generation",
+    )
+    gen_parser.add_argument(
+        "--measure",
+        "-m",
+        action="store_true",
+        help="Report prefill and generation timings from the provider",
+    )
+    gen_parser.add_argument(
+        "--no-rules",
+        "-nr",
+        action="store_true",
+        help="Always ask the model, skipping the rule-based fast path",
+    )
+    gen_parser.add_argument(
+        "--regenerate",
+        "-r",
+        action="store_true",
+        help="Ignore cached messages for the current staged changes",
+    )
+
+    # Rewrite command
+    rewrite_parser = subparsers.add_parser(
+        "rewrite", help="Regenerate commit messages for an existing commit range"
+    )
+    rewrite_parser.add_argument(
+        "rev_range",
+        help="Revision range to rewrite (e.g. main..HEAD)",
+    )
+    rewrite_parser.add_argument(
+        "--provider",
+        "-p",
+        help="AI provider to use (overrides default)",
+        choices=[
+            "openai",
+            "anthropic",
+            "gemini",
+            "azure_openai",
+            "ollama",
+            "huggingface",
+        ],
+    )
+    rewrite_parser.add_argument(
+        "--format",
+        "-f",
+        help="Commit message format",
+        choices=["conventional", "semantic", "simple", "angular"],
+    )
+    rewrite_parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=4,
+        help="Number of concurrent generation requests",
+    )
+    rewrite_parser.add_argument(
+        "--output",
+        "-o",
+        help="Output file (default: cmscribe-rewrite.json or cmscribe-rebase-todo.txt)",
+    )
+    rewrite_parser.add_argument(
+        "--rebase-script",
+        "-rs",
+        action="store_true",
+        help="Write a ready-to-apply rebase todo list instead of a message map",
+    )
+    rewrite_parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore any checkpoint from an interrupted run",
+    )
+
+    # Stats command
+    stats_parser = subparsers.add_parser("stats", help="Show statistics across cmscribe runs")
+    stats_parser.add_argument(
+        "--openmetrics",
+        "-om",
+        help="Also write cumulative metrics as a node_exporter textfile to this path",
     )
 
     # Config commands
@@ -154,12 +245,54 @@ def main():
         help="Clear all caches",
     )
 
+    # Export/import cache snapshots
+    export_parser = cache_subparsers.add_parser(
+        "export", help="Pack the cache into a single compressed archive"
+    )
+    import_parser = cache_subparsers.add_parser(
+        "import", help="Merge a cache archive into the local cache"
+    )
+    for snapshot_parser in (export_parser, import_parser):
+        snapshot_parser.add_argument(
+            "archive",
+            nargs="?",
+            default="cmscribe-cache.tar.gz",
+            help="Archive path (default: cmscribe-cache.tar.gz)",
+        )
+        snapshot_parser.add_argument(
+            "--repo",
+            "-r",
+            help="Only include entries for this repository",
+        )
+        snapshot_parser.add_argument(
+            "--provider",
+            "-p",
+            help="Only include entries for this provider",
+            choices=[
+                "openai",
+                "anthropic",
+                "gemini",
+                "azure_openai",
+                "ollama",
+                "huggingface",
+            ],
+        )
+        snapshot_parser.add_argument(
+            "--model",
+            "-m",
+            help="Only include entries for this model",
+        )
+
     parser.add_argument("--version", "-v", action="version", version=__version__)
 
     args = parser.parse_args()
 
     if args.command == "gen":
         process_gen_command(args)
+    elif args.command == "rewrite":
+        process_rewrite_command(args)
+    elif args.command == "stats":
+        process_stats_command(args)
     elif args.command == "config":
         if args.config_command == "create":
             process_create_config()
@@ -174,9 +307,14 @@ def main():
             for key, value in config["Core"].items():
                 print(f"  {key}: {value}")
 
+            if "Rules" in config:
+                print("\nFast-path Rules:")
+                for key, value in config["Rules"].items():
+                    print(f"  {key}: {value}")
+
             print("\nProvider Settings:")
             for section in config.sections():
-                if section != "Core":
+                if section not in ("Core", "Rules"):
                     print(f"\n{section}:")
                     for key, value in config[section].items():
                         if key != "api_key":  # Don't show API keys
@@ -192,6 +330,8 @@ def main():
         if args.cache_command == "clear":
             if args.all:
                 cache_manager.clear_all_contexts()
+                cache_manager.clear_all_responses()
+                cache_manager.clear_all_diffs()
                 print("All caches cleared.")
             elif args.provider:
                 from cmscribe.utils import get_repo_name
@@ -199,6 +339,7 @@ def main():
                 repo_name = get_repo_name()
                 if args.model:
                     cache_manager.clear_context(repo_name, args.provider, args.model)
+                    cache_manager.clear_responses(repo_name, args.provider, args.model)
                     print(
                         f"Cache cleared for {args.provider} ({args.model}) in current repository."
                     )
@@ -211,17 +352,39 @@ def main():
                                     cache_file.unlink()
                         except (json.JSONDecodeError, IOError):
                             continue
+                    cache_manager.clear_responses(provider=args.provider)
                     print(f"All caches cleared for {args.provider}.")
             else:
                 print("Please specify --provider or --all to clear caches.")
+        elif args.cache_command == "export":
+            try:
+                count = export_cache(
+                    cache_manager, Path(args.archive), args.repo, args.provider, args.model
+                )
+            except SnapshotError as e:
+                print(f"Error: {e}")
+            else:
+                print(f"Exported {count} cache entries to {args.archive}.")
+        elif args.cache_command == "import":
+            try:
+                imported, skipped = import_cache(
+                    cache_manager, Path(args.archive), args.repo, args.provider, args.model
+                )
+            except SnapshotError as e:
+                print(f"Error: {e}")
+            else:
+                print(
+                    f"Imported {imported} cache entries from {args.archive} "
+                    f"({skipped} skipped, local copy newer)."
+                )
         elif args.cache_command is None:
             cache_parser.print_help()
         else:
-            print("Invalid cache command. Use 'clear'.")
+            print("Invalid cache command. Use 'clear', 'export', or 'import'.")
     elif args.command is None:
         parser.print_help()
     else:
-        print("Invalid command. Use 'gen', 'config', or 'cache'.")
+        print("Invalid command. Use 'gen', 'rewrite', 'stats', 'config', or 'cache'.")
 
 
 if __name__ == "__main__":
@@ -4,7 +4,15 @@ from typing import Any, Dict
 
 import requests
 
-from cmscribe.core import CommitFormat
+from cmscribe.core import (
+    STOP_SEQUENCES,
+    CommitFormat,
+    Prompt,
+    build_prompt,
+    metrics,
+    output_schema,
+    parse_output,
+)
 
 from .base import AIProvider
 
@@ -16,7 +24,8 @@ class OllamaProvider(AIProvider):
         """Initialize the Ollama provider."""
         super().__init__(config)
         self.endpoint = config.get("endpoint", "http://localhost:11434")
-        self._load_context()
+        # Timings reported by the server for the last request
+        self.last_metrics: Dict[str, Any] = {}
 
     def get_default_model(self) -> str:
         return "llama2"
@@ -28,84 +37,106 @@ class OllamaProvider(AIProvider):
         # Get the staged changes
         from cmscribe.utils import get_file_content_before_after, get_staged_files
 
-        staged_files = get_staged_files()
+        with metrics.stage("extract"):
+            staged_files = get_staged_files()
 
-        if not staged_files:
-            return None, "No staged changes found."
+            if not staged_files:
+                return None, "No staged changes found."
 
-        # Get the diff content
-        content = get_file_content_before_after(staged_files)
-        diff_content = "\n".join([f"File: {file}\n{content[file]}" for file in staged_files])
+            # Get the diff content
+            content = get_file_content_before_after(staged_files)
 
         # Format the prompt
-        prompt = self._format_prompt(diff_content, commit_format)
+        with metrics.stage("prompt"):
+            prompt = self.build_prompt(content, commit_format)
 
+        return self.generate_from_prompt(prompt, commit_format)
+
+    def build_prompt(
+        self, content: Dict[str, Dict[str, str]], commit_format: CommitFormat
+    ) -> Prompt:
+        """Build the prompt for the given before/after file content.
+
+        Requests send the format's JSON schema, so the prompt asks for its
+        fields rather than a free-text layout.
+        """
+        return build_prompt(content, commit_format, structured=True)
+
+    def generate_from_prompt(self, prompt: Prompt, commit_format: CommitFormat) -> tuple:
+        """Generate a commit message from a prepared prompt.
+
+        The static instructions go in the ``system`` field and the changes in
+        ``prompt``, so the server can reuse its cached prefix between calls.
+        The rolling ``context`` array is deliberately not sent: it grows with
+        every call and defeats that reuse.
+
+        Output is constrained to the format's JSON schema and repaired locally
+        if it still deviates; only when repair fails is the request retried,
+        once, at temperature 0.
+        """
         # Prepare the request
         request_data = {
             "model": self.model,
-            "prompt": prompt,
+            "system": prompt.system,
+            "prompt": prompt.prompt,
+            "format": output_schema(commit_format),
             "stream": False,
             "options": {
                 "temperature": self.temperature,
                 "num_predict": self.max_tokens,
+                "stop": STOP_SEQUENCES,
             },
         }
 
-        # Add context if available
-        if self._context:
-            request_data["context"] = self._context.get("context", [])
-
-        try:
-            # Make the request
-            response = requests.post(
-                f"{self.endpoint}/api/generate", json=request_data, timeout=300
-            )
-            response.raise_for_status()
+        stats: Dict[str, Any] = {"retries": 0, "wasted_tokens": 0}
+        raw = ""
+        for attempt in range(2):
+            if attempt:
+                request_data["options"]["temperature"] = 0
+                stats["retries"] += 1
+                metrics.incr("retries")
+            try:
+                # Make the request
+                with metrics.stage("generate"):
+                    response = requests.post(
+                        f"{self.endpoint}/api/generate", json=request_data, timeout=300
+                    )
+                    response.raise_for_status()
+            except requests.exceptions.Timeout as e:
+                metrics.incr("provider_timeouts")
+                return None, f"Error generating commit message: {str(e)}"
+            except requests.exceptions.RequestException as e:
+                metrics.incr("provider_errors")
+                return None, f"Error generating commit message: {str(e)}"
 
             # Process the response
             result = response.json()
-            message = self._process_response(result)
-
-            # Save the new context
-            if "context" in result:
-                self._save_context({"context": result["context"]})
-
-            return message, None
-        except requests.exceptions.RequestException as e:
-            return None, f"Error generating commit message: {str(e)}"
-
-    def _format_prompt(self, diff: str, commit_format: CommitFormat) -> str:
-        """Format the prompt for Ollama."""
-        format_instructions = {
-    CommitFormat.CONVENTIONAL: (
-        "Generate a commit message following the Conventional Commits format.\n"
-        "Format: <type>(<scope>): <description>\n"
-        "Types: feat, fix, chore, refactor, docs, test, ci, build\n"
-        "Use the imperative mood in the description (e.g., 'fix bug', not 'fixed bug')."
-    ),
-    CommitFormat.SEMANTIC: (
-        "Generate a commit message following Semantic Versioning.\n"
-        "Format: <type>: <description>\n"
-        "Types: major, minor, patch"
-    ),
-    CommitFormat.SIMPLE: (
-        "Generate a simple commit message.\n"
-        "Format: <description>"
-    ),
-    CommitFormat.ANGULAR: (
-        "Generate a commit message following the Angular commit format.\n"
-        "Format: <type>(<scope>): <description>\n"
-        "Types: feat, fix, docs, style, refactor, perf, test, build, ci, chore, revert"
-    ),
-}
-
-
-        return (
-            f"{format_instructions[commit_format]}\n\n"
-            f"Here are the changes:\n{diff}\n\n"
-            "Generate a commit message:"
-        )
+            for key, value in self._extract_metrics(result).items():
+                stats[key] = stats.get(key, 0) + value
+            self.last_metrics = stats
+            metrics.incr("prompt_tokens", result.get("prompt_eval_count", 0))
+            metrics.incr("completion_tokens", result.get("eval_count", 0))
+
+            raw = self._process_response(result)
+            message = parse_output(raw, commit_format)
+            if message:
+                return message, None
+            stats["wasted_tokens"] += result.get("eval_count", 0)
+
+        return None, f"Model output did not match the {commit_format.value} format: {raw!r}"
+
+    def _extract_metrics(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Extract prefill and generation timings from Ollama's response."""
+        # Ollama reports durations in nanoseconds
+        return {
+            "prompt_tokens": response.get("prompt_eval_count", 0),
+            "prefill_ms": response.get("prompt_eval_duration", 0) / 1e6,
+            "completion_tokens": response.get("eval_count", 0),
+            "generation_ms": response.get("eval_duration", 0) / 1e6,
+            "load_ms": response.get("load_duration", 0) / 1e6,
+            "total_ms": response.get("total_duration", 0) / 1e6,
+        }
 
     def _process_response(self, response: Dict[str, Any]) -> str:
-        """Process Ollama's response into a commit message."""
+        """Process Ollama's response into raw model output."""
         return response.get("response", "").strip()
@@ -1,2 +1,17 @@
-from .cmd_ import process_create_config, process_gen_command, process_update_config
-from .git_ import get_file_content_before_after, get_repo_name, get_staged_content, get_staged_files
+from .cmd_ import (
+    process_create_config,
+    process_gen_command,
+    process_rewrite_command,
+    process_stats_command,
+    process_update_config,
+)
+from .git_ import (
+    get_commit_content_before_after,
+    get_commits_in_range,
+    get_file_content_before_after,
+    get_repo_name,
+    get_staged_changes,
+    get_staged_content,
+    get_staged_files,
+    get_staged_text,
+)
@@ -1,13 +1,28 @@
 """Command-line interface utilities."""
 
 import argparse
+import hashlib
+from pathlib import Path
 from typing import Any, Dict, Optional
 
+from git import GitCommandError
+
 from cmscribe.core import (
+    CacheManager,
     CommitFormat,
+    RuleEngine,
+    SingleFlight,
+    atomic_write_text,
     create_config,
+    format_openmetrics,
     get_default_provider,
     get_provider_config,
+    get_rules_config,
+    load_config,
+    load_runs,
+    load_totals,
+    metrics,
+    summarize,
     update_config,
 )
 from cmscribe.providers import (
@@ -19,6 +34,14 @@ from cmscribe.providers import (
     OpenAIProvider,
 )
 
+from .git_ import (
+    get_commits_in_range,
+    get_repo_name,
+    get_staged_changes,
+    get_staged_content,
+    get_staged_text,
+)
+
 
 def get_provider(provider_name: str, config: Dict[str, Any]):
     """Get the appropriate provider instance based on the provider name."""
@@ -48,10 +71,11 @@ def process_gen_command(args: argparse.Namespace) -> None:
         print(f"Error: Invalid provider '{provider_name}'")
         return
 
-    # Clear context if requested
+    # Clear cached context and messages if requested, so nothing stale is reused
     if args.clear_context:
         provider.clear_context()
-        print("Context cache cleared.")
+        CacheManager().clear_responses(get_repo_name(), provider_name, provider.model)
+        print("Context and cached messages cleared.")
 
     # Get commit format
     commit_format = args.format or provider_config.get("commit_format", "conventional")
@@ -61,13 +85,27 @@ def process_gen_command(args: argparse.Namespace) -> None:
         print(f"Error: Invalid commit format '{commit_format}'")
         return
 
-    # Generate commit message
+    # Generate commit message, trying the local fast path first
+    metrics.start_run("gen")
+    fast_path = False
+    message = None
     try:
-        message, err = provider.generate_commit_message(commit_format)
+        if not args.no_rules:
+            with metrics.stage("rules"):
+                message = get_fast_path_message(commit_format)
+            fast_path = message is not None
+        if not fast_path:
+            message, err = generate_coalesced(
+                provider, provider_name, commit_format, regenerate=args.regenerate
+            )
         if message:
-            print("\nGenerated commit message:")
+            print(f"\nGenerated commit message{' (fast path)' if fast_path else ''}:")
             print(message)
 
+            if args.measure and not fast_path:
+                print_generation_metrics(getattr(provider, "last_metrics", {}))
+                print_noise_reduction(metrics.get_counter("noise_bytes_removed"))
+
             if args.auto:
                 # TODO: Implement auto-commit functionality
                 print("\nAuto-commit functionality coming soon!")
@@ -76,6 +114,188 @@ def process_gen_command(args: argparse.Namespace) -> None:
     except Exception as e:
         print(f"Error generating commit message: {str(e)}")
 
+    metrics.finish_run(
+        CacheManager().cache_dir,
+        provider=provider_name,
+        model=provider.model,
+        fast_path=fast_path,
+        outcome="ok" if message else "error",
+    )
+
+
+def generate_coalesced(
+    provider: Any, provider_name: str, commit_format: CommitFormat, regenerate: bool = False
+) -> tuple:
+    """Generate a message, sharing the work with identical requests in other processes.
+
+    Requests are keyed by provider, model, format and the staged diff. With
+    ``cache_responses`` enabled, an earlier result for the same key is reused
+    unless ``regenerate`` is set.
+    """
+    staged_diff = get_staged_content()
+    if not staged_diff:
+        return provider.generate_commit_message(commit_format)
+
+    key_str = f"{provider_name}:{provider.model}:{commit_format.value}:{staged_diff}"
+    key = hashlib.sha256(key_str.encode()).hexdigest()
+    cache_manager = CacheManager()
+    repo_name = get_repo_name()
+    reuse_cached = not regenerate and load_config()["Core"].getboolean(
+        "cache_responses", fallback=False
+    )
+
+    def save(message: str) -> None:
+        cache_manager.save_response(key, repo_name, provider_name, provider.model, message)
+
+    return SingleFlight(cache_manager).run(
+        key,
+        lambda: provider.generate_commit_message(commit_format),
+        save,
+        reuse_cached=reuse_cached,
+    )
+
+
+def get_fast_path_message(commit_format: CommitFormat) -> Optional[str]:
+    """Get a rule-based message for trivial staged changes, or None to use the model."""
+    rules_config = get_rules_config()
+    if not rules_config["enabled"]:
+        return None
+    engine = RuleEngine.from_config(rules_config)
+    return engine.match(get_staged_changes(), commit_format, get_staged_text)
+
+
+def process_stats_command(args: argparse.Namespace) -> None:
+    """Process the stats command."""
+    cache_dir = CacheManager().cache_dir
+    summary = summarize(load_runs(cache_dir))
+    counters = summary["counters"]
+    print("\ncmscribe statistics:")
+    print(f"  gen runs:          {summary['runs']}")
+    for outcome, count in sorted(summary["outcomes"].items()):
+        print(f"    {outcome}: {count}")
+    print(
+        f"  fast path hits:    {summary['fast_path_hits']} "
+        f"({summary['fast_path_hit_rate']:.1%})"
+    )
+    print(
+        f"  gen latency:       p50 {summary['latency_p50']:.2f}s, "
+        f"p95 {summary['latency_p95']:.2f}s"
+    )
+    for name, p50 in summary["stage_p50"].items():
+        print(f"    {name}: p50 {p50:.3f}s")
+    print(
+        f"  tokens:            {counters.get('prompt_tokens', 0)} prompt, "
+        f"{counters.get('completion_tokens', 0)} completion"
+    )
+    for cache, ratio in summary["cache_hit_ratios"].items():
+        print(
+            f"  {cache + ' cache:':<19}{counters.get(f'{cache}_cache_hits', 0)} hits, "
+            f"{counters.get(f'{cache}_cache_misses', 0)} misses ({ratio:.1%})"
+        )
+    print(
+        f"  provider failures: {counters.get('provider_errors', 0)} errors, "
+        f"{counters.get('provider_timeouts', 0)} timeouts"
+    )
+    noise_bytes = counters.get("noise_bytes_removed", 0)
+    print(f"  noise removed:     {noise_bytes} bytes (~{noise_bytes // 4} tokens)")
+
+    if args.openmetrics:
+        atomic_write_text(Path(args.openmetrics), format_openmetrics(load_totals(cache_dir)))
+        print(f"\nOpenMetrics written to {args.openmetrics}.")
+
+
+def print_generation_metrics(timings: Dict[str, Any]) -> None:
+    """Print the timings reported by the provider for the last generation."""
+    if not timings:
+        print("\nNo timing metrics reported by this provider.")
+        return
+    print("\nGeneration metrics:")
+    print(f"  prefill:    {timings['prompt_tokens']} tokens in {timings['prefill_ms']:.1f} ms")
+    print(
+        f"  generation: {timings['completion_tokens']} tokens in {timings['generation_ms']:.1f} ms"
+    )
+    print(f"  model load: {timings['load_ms']:.1f} ms")
+    if "retries" in timings:
+        print(f"  retries:    {timings['retries']} ({timings['wasted_tokens']} tokens wasted)")
+    print(f"  total:      {timings['total_ms']:.1f} ms")
+
+
+def print_noise_reduction(noise_bytes: int) -> None:
+    """Print how much diff noise was left out of the prompt.
+
+    Tokens are estimated at four bytes each, which is close for code and
+    English text with most tokenizers.
+    """
+    print(f"  noise:      {noise_bytes} bytes (~{noise_bytes // 4} tokens) left out of the prompt")
+
+
+def process_rewrite_command(args: argparse.Namespace) -> None:
+    """Process the rewrite command."""
+    from .rewrite_ import (
+        get_checkpoint_path,
+        rewrite_range,
+        write_message_map,
+        write_rebase_script,
+    )
+
+    provider_name = args.provider or get_default_provider()
+    provider_config = get_provider_config(provider_name)
+
+    provider = fetch_provider(provider_name, provider_config)
+    if not provider:
+        print(f"Error: Invalid provider '{provider_name}'")
+        return
+    if not hasattr(provider, "generate_from_prompt"):
+        print(f"Error: Provider '{provider_name}' does not support rewrite yet.")
+        return
+
+    commit_format = args.format or provider_config.get("commit_format", "conventional")
+    try:
+        commit_format = CommitFormat(commit_format)
+    except ValueError:
+        print(f"Error: Invalid commit format '{commit_format}'")
+        return
+
+    try:
+        commits = get_commits_in_range(args.rev_range)
+    except GitCommandError as e:
+        print(f"Error: Invalid revision range '{args.rev_range}': {e.stderr.strip()}")
+        return
+
+    checkpoint_path = get_checkpoint_path(
+        CacheManager(), args.rev_range, provider_name, provider.model, commit_format
+    )
+    metrics.start_run("rewrite")
+    result = rewrite_range(
+        provider,
+        commit_format,
+        commits,
+        args.rev_range,
+        checkpoint_path,
+        workers=max(1, args.workers),
+        resume=not args.restart,
+    )
+    metrics.finish_run(
+        CacheManager().cache_dir,
+        provider=provider_name,
+        model=provider.model,
+        outcome="ok" if result is not None else "interrupted",
+    )
+    if result is None:
+        return
+    commits, messages = result
+
+    if args.rebase_script:
+        output_path = Path(args.output or "cmscribe-rebase-todo.txt")
+        write_rebase_script(output_path, commits, messages)
+        base = f"{commits[0].hexsha}^" if commits and commits[0].parents else "--root"
+        print(f"Rebase script written to {output_path}. Apply it with:")
+        print(f'  GIT_SEQUENCE_EDITOR="cp {output_path}" git rebase -i {base}')
+    else:
+        output_path = Path(args.output or "cmscribe-rewrite.json")
+        write_message_map(output_path, commits, messages)
+        print(f"Message map written to {output_path}.")
+
 
 def process_create_config() -> None:
     """Process the create config command."""
@@ -1,4 +1,24 @@
-from git import Repo, InvalidGitRepositoryError
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from git import NULL_TREE, InvalidGitRepositoryError, Repo
+
+from cmscribe.core import CacheManager, metrics
+from cmscribe.core.normalize import (
+    NORMALIZE_VERSION,
+    normalized_diff,
+    omission_reason,
+    omitted_diff,
+)
+from cmscribe.core.prompt import DELETED_FILE_MARKER, NEW_FILE_MARKER
+
+# Below this much blob data per worker, a process pool costs more than it saves
+PARALLEL_BYTES_PER_WORKER = 512 * 1024
+
+# Paths per ``git check-attr`` call, to stay under command line length limits
+CHECK_ATTR_BATCH = 500
 
 try:
     repo = Repo(".", search_parent_directories=True)
@@ -11,6 +31,22 @@ def get_staged_files():
     return [diff.a_path for diff in diffs]
 
 
+def get_staged_changes():
+    """Get ``(status, old_path, new_path)`` for each staged change, with renames detected."""
+    # -z keeps paths unquoted, so names with non-ASCII characters are classified too
+    fields = repo.git.diff("--cached", "--name-status", "-M", "-z").split("\0")
+    changes = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i]
+        # Renames and copies list both the old and the new path
+        path_count = 2 if status[:1] in ("R", "C") else 1
+        paths = fields[i + 1 : i + 1 + path_count]
+        changes.append((status, paths[0], paths[-1]))
+        i += 1 + path_count
+    return changes
+
+
 def get_repo_name():
     """Get the name of the repository."""
     return repo.working_tree_dir.split("/")[-1]
@@ -22,21 +58,191 @@ def get_staged_content():
 
 def get_file_content_before_after(staged_files):
     """Get content of staged files before (HEAD) and after (staged)."""
-    content = {}
+    return _build_content(_read_staged_blobs(staged_files))
+
+
+def get_staged_text(staged_files):
+    """Get decoded before/after text of staged files, without diffing them.
+
+    For cheap local checks such as the fast-path rules: nothing is cached,
+    normalized or counted in the run metrics.
+    """
+    return {
+        file_path: {
+            "before": _decode(data_before, NEW_FILE_MARKER),
+            "after": _decode(data_after, DELETED_FILE_MARKER),
+        }
+        for file_path, data_before, data_after in _read_staged_blobs(staged_files)
+    }
+
+
+def _read_staged_blobs(staged_files):
+    """Read ``(path, HEAD bytes, staged bytes)``, with None for a missing side."""
+    tree = repo.head.commit.tree
+    items = []
     for file_path in staged_files:
         try:
-            blob_before = repo.head.commit.tree[file_path]
-            content_before = blob_before.data_stream.read().decode("utf-8")
+            data_before = tree[file_path].data_stream.read()
         except KeyError:
-            content_before = "<new file, no prior content>"
+            data_before = None
         try:
-            blob_after = repo.index.entries[(file_path, 0)].to_blob(repo)
-            content_after = blob_after.data_stream.read().decode("utf-8")
+            data_after = repo.index.entries[(file_path, 0)].to_blob(repo).data_stream.read()
         except KeyError:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content_after = f.read()
+            try:
+                with open(file_path, "rb") as f:
+                    data_after = f.read()
+            except FileNotFoundError:
+                data_after = None
         except IndexError:
-            content_after = "<file deleted>"
+            data_after = None
+        items.append((file_path, data_before, data_after))
+    return items
+
+
+def get_commits_in_range(rev_range):
+    """Get the non-merge commits in a revision range, oldest first."""
+    return list(repo.iter_commits(rev_range, reverse=True, no_merges=True))
+
 
-        content[file_path] = {"before": content_before, "after": content_after}
+def get_commit_content_before_after(commit):
+    """Get content of the files a commit touched, before (parent) and after (commit)."""
+    parent = commit.parents[0] if commit.parents else None
+    if parent is not None:
+        diffs = parent.diff(commit)
+    else:
+        diffs = commit.diff(NULL_TREE)
+    items = []
+    for diff in diffs:
+        blob_before, blob_after = diff.a_blob, diff.b_blob
+        if parent is None:
+            # Diffing against the empty tree reverses a/b for root commits
+            blob_before, blob_after = blob_after, blob_before
+        items.append(
+            (
+                diff.b_path or diff.a_path,
+                blob_before.data_stream.read() if blob_before is not None else None,
+                blob_after.data_stream.read() if blob_after is not None else None,
+            )
+        )
+    return _build_content(items)
+
+
+def get_diff_attributes(paths):
+    """Get the ``linguist-generated`` and ``diff`` attributes of each path."""
+    attributes = {path: {} for path in paths}
+    for start in range(0, len(paths), CHECK_ATTR_BATCH):
+        batch = paths[start : start + CHECK_ATTR_BATCH]
+        # -z keeps paths unquoted and gives NUL-separated (path, attribute, value) triples
+        fields = repo.git.check_attr("-z", "linguist-generated", "diff", "--", *batch)
+        fields = fields.split("\0")
+        for i in range(0, len(fields) - 2, 3):
+            path, name, value = fields[i : i + 3]
+            if value != "unspecified" and path in attributes:
+                attributes[path][name] = value
+    return attributes
+
+
+def _build_content(items):
+    """Decode and diff ``(path, before, after)`` blob bytes, in parallel for large changes.
+
+    Blobs are read serially by the caller, since GitPython's object reader is
+    not safe to share between threads; the CPU-bound line matching is what
+    gets spread over processes, and workers send back only the diff. Small
+    changes stay inline so they do not pay pool startup cost, and so do calls
+    from worker threads (as in ``rewrite``), since forking a multithreaded
+    process can deadlock the child. Normalized diffs are cached by blob pair,
+    so only files not seen before are diffed. Results keep the order of
+    ``items``.
+    """
+    cache_manager = CacheManager()
+    attributes = get_diff_attributes([file_path for file_path, _, _ in items])
+    entries = {}
+    pending = []
+    for item in items:
+        file_path, data_before, data_after = item
+        reason = omission_reason(attributes[file_path])
+        cached = None
+        if not reason:
+            cached = cache_manager.get_diff(_diff_cache_key(item))
+            if not cached:
+                metrics.incr("diff_cache_misses")
+                pending.append(item)
+                continue
+            metrics.incr("diff_cache_hits")
+        before = _decode(data_before, NEW_FILE_MARKER)
+        after = _decode(data_after, DELETED_FILE_MARKER)
+        if reason:
+            diff, eliminated = omitted_diff(reason, before, after)
+        else:
+            diff, eliminated = cached["diff"], cached["eliminated"]
+        entries[file_path] = (before, after, diff, eliminated)
+
+    total_bytes = sum(len(before or b"") + len(after or b"") for _, before, after in pending)
+    workers = min(
+        os.cpu_count() or 1,
+        len(pending),
+        total_bytes // PARALLEL_BYTES_PER_WORKER,
+    )
+    repo_name = get_repo_name()
+    if workers < 2 or threading.current_thread() is not threading.main_thread():
+        computed = None
+    else:
+        # Workers get the blob bytes and send back only the diff; the parent
+        # decodes the text it keeps itself rather than receiving it back
+        executor = ProcessPoolExecutor(max_workers=workers)
+        with executor:
+            chunksize = max(1, len(pending) // (workers * 4))
+            computed = list(executor.map(_compute_diff, pending, chunksize=chunksize))
+    for n, item in enumerate(pending):
+        file_path, data_before, data_after = item
+        before = _decode(data_before, NEW_FILE_MARKER)
+        after = _decode(data_after, DELETED_FILE_MARKER)
+        if computed is None:
+            diff, eliminated = normalized_diff(file_path, before, after)
+        else:
+            diff, eliminated = computed[n]
+        entries[file_path] = (before, after, diff, eliminated)
+        cache_manager.save_diff(
+            _diff_cache_key(item), {"repo": repo_name, "diff": diff, "eliminated": eliminated}
+        )
+
+    content = {}
+    for file_path, _, _ in items:
+        before, after, diff, eliminated = entries[file_path]
+        content[file_path] = {
+            "before": before,
+            "after": after,
+            "diff": diff,
+            "noise_bytes": eliminated,
+        }
+    metrics.incr("noise_bytes_removed", sum(entry["noise_bytes"] for entry in content.values()))
     return content
+
+
+def _diff_cache_key(item):
+    """Key a file's normalized diff by its path and the git object ids of both blobs."""
+    file_path, data_before, data_after = item
+    blob_ids = [
+        hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest() if data is not None else "-"
+        for data in (data_before, data_after)
+    ]
+    key = f"{NORMALIZE_VERSION}:{file_path}:{blob_ids[0]}:{blob_ids[1]}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def _compute_diff(item):
+    """Compute one file's normalized diff from its blob bytes (runs in a worker).
+
+    Returns the diff and the bytes of noise it left out.
+    """
+    file_path, data_before, data_after = item
+    before = _decode(data_before, NEW_FILE_MARKER)
+    after = _decode(data_after, DELETED_FILE_MARKER)
+    return normalized_diff(file_path, before, after)
+
+
+def _decode(data, marker):
+    """Decode blob bytes, or return the marker for a missing side."""
+    if data is None:
+        return marker
+    return data.decode("utf-8", errors="replace")
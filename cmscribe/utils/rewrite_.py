@@ -0,0 +1,212 @@
+"""Bulk commit message rewriting for an existing revision range."""
+
+import hashlib
+import json
+import queue
+import shlex
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from cmscribe.core import CacheManager, CommitFormat, atomic_write_json
+
+from .git_ import get_commit_content_before_after, get_repo_name
+
+# Marks the end of a pipeline queue
+_DONE = object()
+
+
+def get_checkpoint_path(
+    cache_manager: CacheManager,
+    rev_range: str,
+    provider: str,
+    model: str,
+    commit_format: CommitFormat,
+) -> Path:
+    """Get the checkpoint file for a rewrite of the given range."""
+    key_str = f"{get_repo_name()}:{rev_range}:{provider}:{model}:{commit_format.value}"
+    key = hashlib.md5(key_str.encode()).hexdigest()
+    return cache_manager.cache_dir / "rewrite" / f"{key}.json"
+
+
+def load_checkpoint(checkpoint_path: Path) -> Dict[str, str]:
+    """Load the messages generated by a previous, interrupted run."""
+    if not checkpoint_path.exists():
+        return {}
+    try:
+        with open(checkpoint_path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_checkpoint(checkpoint_path: Path, messages: Dict[str, str]) -> None:
+    """Save the messages generated so far."""
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        atomic_write_json(checkpoint_path, messages)
+    except OSError as e:
+        print(f"Warning: Failed to save checkpoint: {e}")
+
+
+def remove_checkpoint(checkpoint_path: Path) -> None:
+    """Remove the checkpoint of a finished run."""
+    try:
+        checkpoint_path.unlink()
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Warning: Failed to remove checkpoint: {e}")
+
+
+def write_message_map(output_path: Path, commits: List[Any], messages: Dict[str, str]) -> None:
+    """Write the generated messages as a ``{sha: message}`` JSON map, oldest first."""
+    message_map = {c.hexsha: messages[c.hexsha] for c in commits if c.hexsha in messages}
+    with open(output_path, "w") as f:
+        json.dump(message_map, f, indent=2)
+
+
+def write_rebase_script(output_path: Path, commits: List[Any], messages: Dict[str, str]) -> None:
+    """Write a rebase todo list that rewords each commit with its generated message.
+
+    Todo commands are one per line, so messages go to files in
+    ``<output>.msgs/`` and are applied with ``git commit --amend -F``.
+    """
+    message_dir = output_path.resolve().with_name(output_path.name + ".msgs")
+    message_dir.mkdir(parents=True, exist_ok=True)
+    lines = []
+    for commit in commits:
+        lines.append(f"pick {commit.hexsha} {commit.summary}")
+        if commit.hexsha in messages:
+            message_file = message_dir / f"{commit.hexsha}.txt"
+            message_file.write_text(messages[commit.hexsha] + "\n")
+            lines.append(f"exec git commit --amend --quiet -F {shlex.quote(str(message_file))}")
+    with open(output_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _extract(commits: List[Any], extracted: queue.Queue, results: queue.Queue) -> None:
+    """Producer stage: extract each commit's diff against its parent."""
+    for commit in commits:
+        try:
+            content = get_commit_content_before_after(commit)
+        except Exception as e:
+            results.put((commit.hexsha, None, f"failed to extract diff: {e}"))
+            continue
+        if not content:
+            results.put((commit.hexsha, None, "empty commit"))
+            continue
+        extracted.put((commit.hexsha, content))
+    extracted.put(_DONE)
+
+
+def _build_prompts(
+    provider: Any,
+    commit_format: CommitFormat,
+    extracted: queue.Queue,
+    prompts: queue.Queue,
+    results: queue.Queue,
+) -> None:
+    """Prompt stage: build prompts and hand them to the generation workers."""
+    while True:
+        item = extracted.get()
+        if item is _DONE:
+            return
+        sha, content = item
+        try:
+            prompt = provider.build_prompt(content, commit_format)
+        except Exception as e:
+            results.put((sha, None, f"failed to build prompt: {e}"))
+            continue
+        # Blocks while the bounded queue is full
+        prompts.put((sha, prompt))
+
+
+def _generate(
+    provider: Any,
+    commit_format: CommitFormat,
+    prompts: queue.Queue,
+    results: queue.Queue,
+) -> None:
+    """Generation stage: ask the provider for a message, one prompt at a time."""
+    while True:
+        sha, prompt = prompts.get()
+        try:
+            message, err = provider.generate_from_prompt(prompt, commit_format)
+        except Exception as e:
+            message, err = None, str(e)
+        results.put((sha, message, err))
+
+
+def rewrite_range(
+    provider: Any,
+    commit_format: CommitFormat,
+    commits: List[Any],
+    rev_range: str,
+    checkpoint_path: Path,
+    workers: int = 4,
+    resume: bool = True,
+) -> Optional[tuple]:
+    """Generate messages for the ``commits`` of a range.
+
+    Extraction, prompt building and generation run as overlapping stages;
+    generation uses ``workers`` threads fed from a bounded queue. Every finished
+    message is checkpointed so an interrupted run picks up where it stopped;
+    the checkpoint is removed once every commit has a message.
+    Returns ``(commits, messages)``, or None if the run was interrupted.
+    """
+    messages = load_checkpoint(checkpoint_path) if resume else {}
+    pending = [c for c in commits if c.hexsha not in messages]
+
+    print(f"{len(commits)} commits in {rev_range}, {len(commits) - len(pending)} from checkpoint.")
+    if not pending:
+        remove_checkpoint(checkpoint_path)
+        return commits, messages
+
+    extracted: queue.Queue = queue.Queue(maxsize=workers * 2)
+    prompts: queue.Queue = queue.Queue(maxsize=workers * 2)
+    results: queue.Queue = queue.Queue()
+
+    # All stages run on daemon threads, so Ctrl-C exits right away instead of
+    # waiting at interpreter exit for requests that are still in flight
+    threading.Thread(target=_extract, args=(pending, extracted, results), daemon=True).start()
+    threading.Thread(
+        target=_build_prompts,
+        args=(provider, commit_format, extracted, prompts, results),
+        daemon=True,
+    ).start()
+    for n in range(workers):
+        threading.Thread(
+            target=_generate,
+            args=(provider, commit_format, prompts, results),
+            name=f"cmscribe-gen_{n}",
+            daemon=True,
+        ).start()
+
+    start = time.monotonic()
+    done = failed = 0
+    try:
+        while done + failed < len(pending):
+            sha, message, err = results.get()
+            if message:
+                messages[sha] = message
+                save_checkpoint(checkpoint_path, messages)
+                done += 1
+                print(f"[{done + failed}/{len(pending)}] {sha[:8]} {message.splitlines()[0]}")
+            else:
+                failed += 1
+                print(f"[{done + failed}/{len(pending)}] {sha[:8]} skipped: {err}")
+    except KeyboardInterrupt:
+        print(f"\nInterrupted. Progress saved to {checkpoint_path}; rerun to resume.")
+        return None
+
+    elapsed = time.monotonic() - start
+    rate = done / elapsed * 60 if elapsed > 0 else 0.0
+    print(
+        f"\nGenerated {done} messages ({failed} failed) in {elapsed:.1f}s "
+        f"({rate:.1f} commits/min)."
+    )
+    if not failed:
+        remove_checkpoint(checkpoint_path)
+    return commits, messages
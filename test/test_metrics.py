@@ -0,0 +1,120 @@
+"""Tests for run metrics aggregation and export."""
+
+import stat
+
+from cmscribe.core import cache, metrics
+from cmscribe.core.cache import CacheManager, atomic_write_text
+
+
+def gen_run(duration, fast_path=False, outcome="ok", **counters):
+    return {
+        "command": "gen",
+        "duration": duration,
+        "outcome": outcome,
+        "fast_path": fast_path,
+        "stages": {"diff": duration / 2},
+        "counters": counters,
+    }
+
+
+def empty_totals(tmp_path):
+    return metrics.load_totals(tmp_path)
+
+
+def test_add_run_accumulates(tmp_path):
+    totals = empty_totals(tmp_path)
+    metrics._add_run(totals, gen_run(0.3, completion_tokens=40, diff_cache_hits=2))
+    metrics._add_run(totals, gen_run(7.0, fast_path=True, diff_cache_misses=1))
+    metrics._add_run(totals, {"command": "rewrite", "duration": 9.0, "counters": {}})
+
+    assert totals["runs"] == 2
+    assert totals["fast_path_hits"] == 1
+    assert totals["outcomes"] == {"gen:ok": 2, "rewrite:ok": 1}
+    assert totals["counters"] == {
+        "completion_tokens": 40,
+        "diff_cache_hits": 2,
+        "diff_cache_misses": 1,
+    }
+    latency = dict(totals["latency_histogram"]["buckets"])
+    assert latency[0.25] == 0
+    assert latency[0.5] == 1
+    assert latency[10.0] == 2
+    assert totals["latency_histogram"]["count"] == 2
+    assert totals["completion_tokens_histogram"]["count"] == 1
+    assert totals["stage_histograms"]["diff"]["count"] == 2
+
+
+def test_update_totals_persists(tmp_path):
+    metrics.update_totals(tmp_path, gen_run(1.0, completion_tokens=10))
+    metrics.update_totals(tmp_path, gen_run(2.0, completion_tokens=20))
+    totals = metrics.load_totals(tmp_path)
+    assert totals["runs"] == 2
+    assert totals["counters"]["completion_tokens"] == 30
+
+
+def test_summarize():
+    runs = [
+        gen_run(1.0, response_cache_hits=1, diff_cache_hits=3, diff_cache_misses=1),
+        gen_run(2.0, fast_path=True, response_cache_misses=1),
+        gen_run(3.0, outcome="error"),
+        {"command": "rewrite", "duration": 30.0, "counters": {"diff_cache_misses": 4}},
+    ]
+    summary = metrics.summarize(runs)
+    assert summary["runs"] == 3
+    assert summary["outcomes"] == {"gen:ok": 2, "gen:error": 1, "rewrite:ok": 1}
+    assert summary["fast_path_hit_rate"] == 1 / 3
+    assert summary["cache_hit_ratios"] == {"response": 0.5, "diff": 3 / 8}
+    assert summary["latency_p50"] == 2.0
+    assert summary["latency_p95"] == 3.0
+
+
+def test_summarize_without_runs():
+    summary = metrics.summarize([])
+    assert summary["runs"] == 0
+    assert summary["fast_path_hit_rate"] == 0.0
+    assert summary["cache_hit_ratios"] == {"response": 0.0, "diff": 0.0}
+
+
+def test_format_openmetrics(tmp_path):
+    totals = empty_totals(tmp_path)
+    metrics._add_run(
+        totals, gen_run(0.3, prompt_tokens=100, completion_tokens=40, diff_cache_hits=2)
+    )
+    lines = metrics.format_openmetrics(totals).splitlines()
+
+    assert "# TYPE cmscribe_runs_total counter" in lines
+    assert 'cmscribe_runs_total{command="gen",outcome="ok"} 1' in lines
+    assert 'cmscribe_tokens_total{kind="prompt"} 100' in lines
+    assert 'cmscribe_cache_lookups_total{cache="diff",result="hit"} 2' in lines
+    assert 'cmscribe_cache_lookups_total{cache="response",result="miss"} 0' in lines
+    assert "# TYPE cmscribe_gen_duration_seconds histogram" in lines
+    assert 'cmscribe_gen_duration_seconds_bucket{le="0.25"} 0' in lines
+    assert 'cmscribe_gen_duration_seconds_bucket{le="0.5"} 1' in lines
+    assert 'cmscribe_gen_duration_seconds_bucket{le="+Inf"} 1' in lines
+    assert 'cmscribe_stage_duration_seconds_count{stage="diff"} 1' in lines
+    assert "# EOF" not in lines
+    # Every sample belongs to a declared family
+    families = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    for line in lines:
+        if not line.startswith("#"):
+            name = line.split("{")[0].split()[0]
+            assert any(name == f or name.startswith(f + "_") for f in families), name
+
+
+def test_clear_all_contexts_keeps_totals(tmp_path):
+    cache_manager = CacheManager(tmp_path)
+    cache_manager.save_context("repo", "ollama", "m", {"messages": []})
+    metrics.update_totals(tmp_path, gen_run(1.0))
+
+    cache_manager.clear_all_contexts()
+
+    assert cache_manager.get_context("repo", "ollama", "m") is None
+    assert metrics.load_totals(tmp_path)["runs"] == 1
+
+
+def test_atomic_write_respects_umask(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "_UMASK", 0o022)
+    path = tmp_path / "cmscribe.prom"
+    atomic_write_text(path, "x\n")
+    # Readable by others, so node_exporter can collect the textfile
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
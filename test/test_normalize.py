@@ -0,0 +1,125 @@
+"""Tests for diff noise reduction."""
+
+import difflib
+
+from cmscribe.core.normalize import normalized_diff, omission_reason, omitted_diff
+from cmscribe.core.prompt import NEW_FILE_MARKER
+
+
+def lines(*rows):
+    return "\n".join(rows) + "\n"
+
+
+def test_plain_changes_match_unified_diff():
+    before = lines("a", "b", "c", "d")
+    after = lines("a", "B", "c", "d", "e")
+    diff, saved = normalized_diff("f.txt", before, after)
+    expected = difflib.unified_diff(
+        before.splitlines(), after.splitlines(), "a/f.txt", "b/f.txt", lineterm=""
+    )
+    assert diff == "\n".join(expected)
+    assert saved == 0
+
+
+def test_identical_content_has_no_diff():
+    assert normalized_diff("f.txt", "a\n", "a\n") == ("", 0)
+
+
+def test_line_endings_only():
+    diff, _ = normalized_diff("f.txt", "a\r\nb\r\n", "a\nb\n")
+    assert diff == "(line endings changed only)"
+
+
+def test_trailing_whitespace_and_token_spacing_are_folded():
+    before = lines("x = 1", "y  =  2", "z = 3")
+    after = lines("x = 1   ", "y = 2", "z = 3")
+    diff, _ = normalized_diff("f.py", before, after)
+    assert diff == "(whitespace-only changes in 2 lines omitted)"
+
+
+def test_whitespace_inside_tokens_is_a_real_change():
+    diff, _ = normalized_diff("f.py", lines('msg = "hello world"'), lines('msg = "helloworld"'))
+    assert '+msg = "helloworld"' in diff
+    assert "whitespace-only" not in diff
+
+
+def test_spacing_inside_string_literals_is_a_real_change():
+    before = lines('x = "a  b"', "y = 'c  d'")
+    after = lines('x = "a b"', "y = 'c d'")
+    diff, _ = normalized_diff("f.py", before, after)
+    assert '+x = "a b"' in diff
+    assert "+y = 'c d'" in diff
+    assert "whitespace-only" not in diff
+
+
+def test_spacing_around_string_literals_is_folded():
+    diff, _ = normalized_diff("f.c", lines('x  =  "a  b";'), lines('x = "a  b";'))
+    assert diff == "(whitespace-only changes in 1 lines omitted)"
+
+
+def test_dedent_is_a_real_change_in_python():
+    before = lines("def f(c):", "    if c:", "        a()", "        b()")
+    after = lines("def f(c):", "    if c:", "        a()", "    b()")
+    diff, _ = normalized_diff("f.py", before, after)
+    assert "+    b()" in diff
+    assert "whitespace-only" not in diff
+
+
+def test_reindent_is_folded_where_indentation_is_not_syntax():
+    before = lines("int f() {", "return 1;", "}")
+    after = lines("int f() {", "    return 1;", "}")
+    diff, _ = normalized_diff("f.c", before, after)
+    assert diff == "(whitespace-only changes in 1 lines omitted)"
+
+
+def test_blank_lines_are_real_changes():
+    diff, _ = normalized_diff("f.py", lines("a", "b"), lines("a", "", "b"))
+    assert diff.endswith(" a\n+\n b")
+
+
+REST = ["def h():", "    a = 1", "    b = 2", "    c = 3", "    d = 4", "    return a"]
+
+
+def test_moved_block_is_reported():
+    block = ["def g():", "    x = 1", "    y = 2", "    return x + y"]
+    before = lines(*block, *REST)
+    after = lines(*REST, *block)
+    diff, saved = normalized_diff("f.py", before, after)
+    assert "(moved 4 unchanged lines from line 1 to line 7)" in diff
+    assert "+    return x + y" not in diff
+    assert saved > 0
+
+
+def test_uniformly_reindented_move_is_reported_as_reindented():
+    block = ["def g(self):", "    x = 1", "    y = 2", "    return x + y"]
+    before = lines(*block, "class C:", *REST)
+    after = lines("class C:", *REST, *("    " + line for line in block))
+    diff, _ = normalized_diff("f.py", before, after)
+    assert "(moved 4 re-indented lines from line 1 to line 8)" in diff
+    assert "unchanged" not in diff
+
+
+def test_non_uniform_reindent_is_not_a_move():
+    before = lines("if a:", "    b()", "    c()", "    d()", *REST)
+    after = lines(*REST, "    if a:", "        b()", "    c()", "    d()")
+    diff, _ = normalized_diff("f.py", before, after)
+    assert "moved" not in diff
+    assert "+        b()" in diff
+
+
+def test_new_file_diff():
+    diff, _ = normalized_diff("f.py", NEW_FILE_MARKER, lines("a"))
+    assert diff.endswith("@@ -0,0 +1 @@\n+a")
+
+
+def test_omission_reason_from_attributes():
+    assert omission_reason({"linguist-generated": "true"}) == "generated file"
+    assert omission_reason({"diff": "unset"}) == "marked -diff in .gitattributes"
+    assert omission_reason({"linguist-generated": "false"}) is None
+    assert omission_reason({}) is None
+
+
+def test_omitted_diff_is_a_note():
+    diff, saved = omitted_diff("generated file", lines(*"abc"), lines(*"xyz" * 20))
+    assert diff == "(generated file, diff omitted)"
+    assert saved > 0
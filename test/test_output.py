@@ -0,0 +1,69 @@
+"""Tests for structured output parsing and repair."""
+
+import re
+
+from cmscribe.core.output import output_schema, parse_output, render_message, repair_message
+from cmscribe.core.types import CommitFormat
+
+
+def test_parse_output_renders_json_fields():
+    raw = '{"type": "feat", "scope": "cli", "description": "add stats command"}'
+    assert parse_output(raw, CommitFormat.CONVENTIONAL) == "feat(cli): add stats command"
+
+
+def test_parse_output_strips_code_fences():
+    raw = '```json\n{"type": "fix", "description": "handle empty diff"}\n```'
+    assert parse_output(raw, CommitFormat.CONVENTIONAL) == "fix: handle empty diff"
+
+
+def test_truncated_json_keeps_complete_fields():
+    raw = '{"type": "feat", "description": "add stats command", "body": "Adds'
+    assert parse_output(raw, CommitFormat.CONVENTIONAL) == "feat: add stats command"
+
+
+def test_truncated_description_is_trimmed_to_last_word():
+    raw = '{"type":"feat","description":"add th'
+    assert parse_output(raw, CommitFormat.CONVENTIONAL) == "feat: add"
+
+
+def test_truncated_single_word_description_is_unrepairable():
+    raw = '{"type":"feat","description":"refacto'
+    assert parse_output(raw, CommitFormat.CONVENTIONAL) is None
+
+
+def test_truncated_type_is_unrepairable():
+    assert parse_output('{"type":"fe', CommitFormat.CONVENTIONAL) is None
+
+
+def test_repair_strips_leading_preamble_only():
+    raw = "Here is the commit message:\n\nfeat: add x\n\nOk, this also fixes y.\nHere is why."
+    assert repair_message(raw, CommitFormat.CONVENTIONAL) == (
+        "feat: add x\n\nOk, this also fixes y.\nHere is why."
+    )
+
+
+def test_repair_lowercases_type_and_drops_quotes():
+    raw = '"Fix(API): handle timeouts."'
+    assert repair_message(raw, CommitFormat.CONVENTIONAL) == "fix(API): handle timeouts"
+
+
+def test_repair_rejects_unknown_type():
+    assert repair_message("wip: stuff", CommitFormat.CONVENTIONAL) is None
+
+
+def test_render_normalizes_scope():
+    fields = {"type": "feat", "scope": "my scope", "description": "add x"}
+    assert render_message(fields, CommitFormat.CONVENTIONAL) == "feat(my-scope): add x"
+
+
+def test_schema_scope_pattern_matches_valid_scopes():
+    pattern = re.compile(output_schema(CommitFormat.ANGULAR)["properties"]["scope"]["pattern"])
+    assert pattern.match("core/cache")
+    assert not pattern.match("my scope")
+
+
+def test_long_subject_is_truncated_at_word_boundary():
+    fields = {"description": "word " * 30}
+    message = render_message(fields, CommitFormat.SIMPLE)
+    assert len(message) <= 72
+    assert message.endswith("word")
@@ -0,0 +1,47 @@
+"""Tests for prompt assembly."""
+
+from cmscribe.core.prompt import (
+    DELETED_FILE_MARKER,
+    NEW_FILE_MARKER,
+    build_prompt,
+    build_system_prompt,
+)
+from cmscribe.core.types import CommitFormat
+
+CONTENT = {
+    "b.py": {"before": "x = 1\n", "after": "x = 2\n"},
+    "a.py": {"before": NEW_FILE_MARKER, "after": "y = 1\n"},
+    "c.py": {"before": "z = 1\n", "after": DELETED_FILE_MARKER, "diff": "(precomputed)"},
+}
+
+
+def test_free_text_prompt_asks_for_layout():
+    system = build_system_prompt(CommitFormat.CONVENTIONAL)
+    assert "commit message only" in system
+    assert "Format: <type>(<scope>): <description>" in system
+    assert "JSON" not in system
+
+
+def test_structured_prompt_asks_for_fields_only():
+    for commit_format in CommitFormat:
+        system = build_system_prompt(commit_format, structured=True)
+        assert "JSON object" in system
+        assert "Format:" not in system
+        assert "commit message only" not in system
+
+
+def test_prompt_renders_files_sorted_after_static_prefix():
+    prompt = build_prompt(CONTENT, CommitFormat.CONVENTIONAL)
+    assert prompt.system == build_system_prompt(CommitFormat.CONVENTIONAL)
+    positions = [prompt.prompt.index(f"File: {path}") for path in ("a.py", "b.py", "c.py")]
+    assert positions == sorted(positions)
+    assert "File: a.py (new file)" in prompt.prompt
+    assert "File: c.py (deleted)\n(precomputed)" in prompt.prompt
+    assert "+x = 2" in prompt.prompt
+
+
+def test_prompt_is_deterministic():
+    reordered = dict(reversed(list(CONTENT.items())))
+    assert build_prompt(CONTENT, CommitFormat.ANGULAR) == build_prompt(
+        reordered, CommitFormat.ANGULAR
+    )
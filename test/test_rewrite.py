@@ -0,0 +1,119 @@
+"""Tests for bulk commit message rewriting."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from cmscribe.core.types import CommitFormat
+from cmscribe.utils import rewrite_
+
+
+def make_commits(count):
+    return [SimpleNamespace(hexsha=f"{n:040x}", summary=f"wip {n}") for n in range(count)]
+
+
+class FakeProvider:
+    """Answers every prompt with a message derived from the commit, failing on request."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.generated = []
+
+    def build_prompt(self, content, commit_format):
+        return content["sha"]
+
+    def generate_from_prompt(self, prompt, commit_format):
+        self.generated.append(prompt)
+        if prompt in self.fail:
+            return None, "model error"
+        return f"feat: change {prompt[-4:]}", None
+
+
+@pytest.fixture(autouse=True)
+def fake_content(monkeypatch):
+    monkeypatch.setattr(
+        rewrite_, "get_commit_content_before_after", lambda commit: {"sha": commit.hexsha}
+    )
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = tmp_path / "rewrite" / "key.json"
+    assert rewrite_.load_checkpoint(path) == {}
+    rewrite_.save_checkpoint(path, {"abc": "feat: x"})
+    assert rewrite_.load_checkpoint(path) == {"abc": "feat: x"}
+
+
+def test_corrupt_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / "key.json"
+    path.write_text("{not json")
+    assert rewrite_.load_checkpoint(path) == {}
+
+
+def test_message_map_keeps_commit_order(tmp_path):
+    commits = make_commits(3)
+    messages = {commits[2].hexsha: "fix: c", commits[0].hexsha: "feat: a"}
+    path = tmp_path / "map.json"
+    rewrite_.write_message_map(path, commits, messages)
+    assert list(json.loads(path.read_text()).values()) == ["feat: a", "fix: c"]
+
+
+def test_rebase_script_rewords_from_message_files(tmp_path):
+    commits = make_commits(2)
+    messages = {commits[0].hexsha: "feat: add x\n\nBody line."}
+    path = tmp_path / "todo.txt"
+    rewrite_.write_rebase_script(path, commits, messages)
+
+    lines = path.read_text().splitlines()
+    message_file = tmp_path / "todo.txt.msgs" / f"{commits[0].hexsha}.txt"
+    assert lines == [
+        f"pick {commits[0].hexsha} wip 0",
+        f"exec git commit --amend --quiet -F {message_file}",
+        f"pick {commits[1].hexsha} wip 1",
+    ]
+    assert message_file.read_text() == "feat: add x\n\nBody line.\n"
+
+
+def test_rewrite_range_generates_every_commit_and_drops_checkpoint(tmp_path):
+    commits = make_commits(5)
+    provider = FakeProvider()
+    checkpoint = tmp_path / "key.json"
+    result = rewrite_.rewrite_range(
+        provider, CommitFormat.CONVENTIONAL, commits, "a..b", checkpoint, workers=2
+    )
+    _, messages = result
+    assert set(messages) == {c.hexsha for c in commits}
+    assert not checkpoint.exists()
+
+
+def test_rewrite_range_resumes_from_checkpoint(tmp_path):
+    commits = make_commits(3)
+    checkpoint = tmp_path / "key.json"
+    rewrite_.save_checkpoint(checkpoint, {commits[0].hexsha: "docs: kept"})
+    provider = FakeProvider()
+    _, messages = rewrite_.rewrite_range(
+        provider, CommitFormat.CONVENTIONAL, commits, "a..b", checkpoint
+    )
+    assert messages[commits[0].hexsha] == "docs: kept"
+    assert sorted(provider.generated) == [commits[1].hexsha, commits[2].hexsha]
+
+
+def test_rewrite_range_without_resume_regenerates(tmp_path):
+    commits = make_commits(2)
+    checkpoint = tmp_path / "key.json"
+    rewrite_.save_checkpoint(checkpoint, {commits[0].hexsha: "docs: stale"})
+    _, messages = rewrite_.rewrite_range(
+        FakeProvider(), CommitFormat.CONVENTIONAL, commits, "a..b", checkpoint, resume=False
+    )
+    assert messages[commits[0].hexsha] != "docs: stale"
+
+
+def test_failed_commits_keep_checkpoint_for_retry(tmp_path):
+    commits = make_commits(3)
+    checkpoint = tmp_path / "key.json"
+    provider = FakeProvider(fail={commits[1].hexsha})
+    _, messages = rewrite_.rewrite_range(
+        provider, CommitFormat.CONVENTIONAL, commits, "a..b", checkpoint
+    )
+    assert commits[1].hexsha not in messages
+    assert set(rewrite_.load_checkpoint(checkpoint)) == {commits[0].hexsha, commits[2].hexsha}
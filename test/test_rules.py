@@ -0,0 +1,121 @@
+"""Tests for the rule-based fast path."""
+
+from cmscribe.core.rules import PathIndex, RuleEngine
+from cmscribe.core.types import CommitFormat
+
+PATTERNS = {
+    "deps": ["uv.lock", "requirements*.txt"],
+    "docs": ["*.md", "docs/*"],
+    "version": ["pyproject.toml"],
+}
+
+
+def no_content(paths):
+    raise AssertionError(f"content should not be loaded for {paths}")
+
+
+def match(changes, load_content=no_content, commit_format=CommitFormat.CONVENTIONAL):
+    return RuleEngine(PATTERNS).match(changes, commit_format, load_content)
+
+
+def test_path_index_classifies_by_pattern_kind():
+    index = PathIndex(PATTERNS)
+    assert index.classify("uv.lock") == "deps"
+    assert index.classify("requirements-dev.txt") == "deps"
+    assert index.classify("docs/guide/setup.rst") == "docs"
+    assert index.classify("src/README.md") == "docs"
+    assert index.classify("src/main.py") is None
+
+
+def test_modified_docs_are_updated():
+    assert match([("M", "README.md", "README.md")]) == "docs: update README.md"
+
+
+def test_added_docs_are_added():
+    assert match([("A", "CHANGES.md", "CHANGES.md")]) == "docs: add CHANGES.md"
+
+
+def test_deleted_docs_are_removed():
+    assert match([("D", "README.md", "README.md")]) == "docs: remove README.md"
+
+
+def test_deleted_lockfile_is_removed():
+    assert match([("D", "uv.lock", "uv.lock")]) == "chore(deps): remove uv.lock"
+
+
+def test_mixed_statuses_are_updated():
+    changes = [("A", "docs/a.md", "docs/a.md"), ("D", "docs/b.md", "docs/b.md")]
+    assert match(changes) == "docs: update a.md and b.md"
+
+
+def test_pure_rename():
+    changes = [("R100", "old.py", "new.py")]
+    assert match(changes) == "refactor: rename old.py to new.py"
+
+
+def test_code_changes_fall_through():
+    assert match([("M", "src/main.py", "src/main.py")]) is None
+
+
+def test_version_bump():
+    def load_content(paths):
+        return {
+            "pyproject.toml": {
+                "before": 'name = "x"\nversion = "1.2.0"\n',
+                "after": 'name = "x"\nversion = "1.3.0"\n',
+            }
+        }
+
+    changes = [("M", "pyproject.toml", "pyproject.toml"), ("M", "uv.lock", "uv.lock")]
+    assert match(changes, load_content) == "chore(release): bump version to 1.3.0"
+
+
+def test_version_file_with_other_edits_falls_through():
+    def load_content(paths):
+        return {
+            "pyproject.toml": {
+                "before": 'name = "x"\nversion = "1.2.0"\n',
+                "after": 'name = "y"\nversion = "1.3.0"\n',
+            }
+        }
+
+    assert match([("M", "pyproject.toml", "pyproject.toml")], load_content) is None
+
+
+def test_simple_format_capitalizes_description():
+    result = match([("M", "README.md", "README.md")], commit_format=CommitFormat.SIMPLE)
+    assert result == "Update README.md"
+
+
+def test_multi_dot_suffixes_match():
+    index = PathIndex({"deps": ["*.lock.json"], "docs": ["*.d.ts"]})
+    assert index.classify("foo.lock.json") == "deps"
+    assert index.classify("types/index.d.ts") == "docs"
+    assert index.classify("foo.json") is None
+
+
+def test_dependency_table_version_is_not_a_release():
+    before = '[tool.poetry]\nversion = "1.0.0"\n\n[tool.poetry.dependencies.requests]\n'
+
+    def load_content(paths):
+        return {
+            "pyproject.toml": {
+                "before": before + 'version = "2.31.0"\n',
+                "after": before + 'version = "2.32.0"\n',
+            }
+        }
+
+    assert match([("M", "pyproject.toml", "pyproject.toml")], load_content) is None
+
+
+def test_project_table_version_is_a_release():
+    def load_content(paths):
+        return {
+            "pyproject.toml": {
+                "before": '[project]\nname = "x"\nversion = "1.0.0"\n\n[tool.black]\n',
+                "after": '[project]\nname = "x"\nversion = "1.1.0"\n\n[tool.black]\n',
+            }
+        }
+
+    changes = [("M", "pyproject.toml", "pyproject.toml")]
+    assert match(changes, load_content) == "chore(release): bump version to 1.1.0"
@@ -0,0 +1,135 @@
+"""Tests for cross-process request coalescing."""
+
+import threading
+import time
+
+from cmscribe.core.cache import CacheManager
+from cmscribe.core.singleflight import SingleFlight
+
+
+def make_flights(tmp_path, count=2):
+    cache_manager = CacheManager(tmp_path)
+    return cache_manager, [SingleFlight(cache_manager, poll_interval=0.01) for _ in range(count)]
+
+
+def saver(cache_manager, key="k"):
+    return lambda message: cache_manager.save_response(key, "repo", "ollama", "m", message)
+
+
+def test_generates_and_releases_lock(tmp_path):
+    cache_manager, (flight, _) = make_flights(tmp_path)
+    result = flight.run("k", lambda: ("feat: x", None), saver(cache_manager))
+    assert result == ("feat: x", None)
+    assert cache_manager.get_response("k")["message"] == "feat: x"
+    assert not (flight.lock_dir / "k.lock").exists()
+
+
+def test_reuses_cached_result_only_when_asked(tmp_path):
+    cache_manager, (flight, _) = make_flights(tmp_path)
+    saver(cache_manager)("feat: old")
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "feat: new", None
+
+    assert flight.run("k", generate, saver(cache_manager), reuse_cached=True)[0] == "feat: old"
+    assert calls == []
+    assert flight.run("k", generate, saver(cache_manager))[0] == "feat: new"
+    assert calls == [1]
+
+
+def test_second_instance_waits_for_and_reuses_first(tmp_path):
+    cache_manager, (first, second) = make_flights(tmp_path)
+    entered, proceed = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_generate():
+        calls.append("first")
+        entered.set()
+        proceed.wait(5)
+        return "feat: shared", None
+
+    results = {}
+    holder = threading.Thread(
+        target=lambda: results.update(first=first.run("k", slow_generate, saver(cache_manager)))
+    )
+    holder.start()
+    assert entered.wait(5)
+
+    def second_generate():
+        calls.append("second")
+        return "feat: duplicate", None
+
+    waiter = threading.Thread(
+        target=lambda: results.update(
+            second=second.run("k", second_generate, saver(cache_manager))
+        )
+    )
+    waiter.start()
+    time.sleep(0.1)
+    assert waiter.is_alive()
+    proceed.set()
+    holder.join(5)
+    waiter.join(5)
+
+    assert calls == ["first"]
+    assert results["first"] == results["second"] == ("feat: shared", None)
+
+
+def test_waiter_takes_over_when_holder_fails(tmp_path):
+    cache_manager, (first, second) = make_flights(tmp_path)
+    entered, proceed = threading.Event(), threading.Event()
+
+    def failing_generate():
+        entered.set()
+        proceed.wait(5)
+        return None, "timeout"
+
+    results = {}
+    holder = threading.Thread(
+        target=lambda: results.update(first=first.run("k", failing_generate, saver(cache_manager)))
+    )
+    holder.start()
+    assert entered.wait(5)
+    waiter = threading.Thread(
+        target=lambda: results.update(
+            second=second.run("k", lambda: ("fix: retry", None), saver(cache_manager))
+        )
+    )
+    waiter.start()
+    proceed.set()
+    holder.join(5)
+    waiter.join(5)
+
+    assert results["first"] == (None, "timeout")
+    assert results["second"] == ("fix: retry", None)
+
+
+def test_lock_is_exclusive_between_instances(tmp_path):
+    _, (first, second) = make_flights(tmp_path)
+    lock_path = first.lock_dir / "k.lock"
+    held = first._acquire(lock_path)
+    assert held is not None
+    assert second._acquire(lock_path) is None
+    first._release(lock_path, held)
+    again = second._acquire(lock_path)
+    assert again is not None
+    second._release(lock_path, again)
+
+
+def test_leftover_lock_file_does_not_block(tmp_path):
+    cache_manager, (flight, _) = make_flights(tmp_path)
+    # A crashed holder leaves the file behind, but not the lock
+    (flight.lock_dir / "k.lock").write_text("12345")
+    assert flight.run("k", lambda: ("feat: x", None), saver(cache_manager)) == ("feat: x", None)
+
+
+def test_lock_on_removed_file_is_not_taken(tmp_path):
+    _, (first, second) = make_flights(tmp_path)
+    lock_path = first.lock_dir / "k.lock"
+    stale = open(lock_path, "a+")
+    lock_path.unlink()
+    lock_path.write_text("")
+    assert not SingleFlight._is_current(lock_path, stale)
+    stale.close()
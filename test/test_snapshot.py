@@ -0,0 +1,124 @@
+"""Tests for cache export and import."""
+
+import io
+import json
+import tarfile
+
+import pytest
+
+from cmscribe.core.cache import CacheManager, atomic_write_json
+from cmscribe.core.snapshot import SnapshotError, export_cache, import_cache
+
+
+def write_entry(cache_manager, relative_path, **fields):
+    path = cache_manager.cache_dir / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    atomic_write_json(path, fields)
+
+
+def read_entry(cache_manager, relative_path):
+    return json.loads((cache_manager.cache_dir / relative_path).read_text())
+
+
+@pytest.fixture
+def source(tmp_path):
+    cache_manager = CacheManager(tmp_path / "source")
+    write_entry(
+        cache_manager, "aa.json", repo="r1", provider="ollama", model="m1", updated_at=100.0
+    )
+    write_entry(
+        cache_manager,
+        "responses/bb.json",
+        repo="r1",
+        provider="openai",
+        model="m2",
+        message="feat: x",
+        created_at=100.0,
+    )
+    write_entry(cache_manager, "diffs/cc.json", repo="r2", diff="d", created_at=100.0)
+    # Local-only state that must not travel
+    write_entry(cache_manager, "metrics_totals.json", runs=3)
+    (cache_manager.cache_dir / "locks").mkdir()
+    (cache_manager.cache_dir / "locks" / "dd.lock").write_text("")
+    return cache_manager
+
+
+def test_round_trip(source, tmp_path):
+    archive = tmp_path / "cache.tar.gz"
+    assert export_cache(source, archive) == 3
+
+    target = CacheManager(tmp_path / "target")
+    assert import_cache(target, archive) == (3, 0)
+    for path in ("aa.json", "responses/bb.json", "diffs/cc.json"):
+        assert read_entry(target, path) == read_entry(source, path)
+    assert not (target.cache_dir / "metrics_totals.json").exists()
+
+
+def test_export_filters(source, tmp_path):
+    archive = tmp_path / "cache.tar.gz"
+    assert export_cache(source, archive, repo="r1") == 2
+    assert export_cache(source, archive, provider="ollama") == 2  # context + diff
+    assert export_cache(source, archive, provider="openai", model="m2") == 2
+    assert export_cache(source, archive, repo="r3") == 0
+
+
+def test_import_filters(source, tmp_path):
+    archive = tmp_path / "cache.tar.gz"
+    export_cache(source, archive)
+    target = CacheManager(tmp_path / "target")
+    assert import_cache(target, archive, repo="r2") == (1, 0)
+    assert (target.cache_dir / "diffs" / "cc.json").exists()
+    assert not (target.cache_dir / "aa.json").exists()
+
+
+def test_newer_side_wins(source, tmp_path):
+    archive = tmp_path / "cache.tar.gz"
+    export_cache(source, archive)
+    target = CacheManager(tmp_path / "target")
+    write_entry(target, "aa.json", repo="r1", provider="ollama", model="m1", updated_at=200.0)
+    write_entry(
+        target,
+        "responses/bb.json",
+        repo="r1",
+        provider="openai",
+        model="m2",
+        message="feat: old",
+        created_at=50.0,
+    )
+
+    assert import_cache(target, archive) == (2, 1)
+    assert read_entry(target, "aa.json")["updated_at"] == 200.0
+    assert read_entry(target, "responses/bb.json")["message"] == "feat: x"
+
+
+def test_export_to_missing_directory_raises(source, tmp_path):
+    with pytest.raises(SnapshotError):
+        export_cache(source, tmp_path / "missing" / "cache.tar.gz")
+
+
+def test_import_rejects_other_archives(tmp_path):
+    archive = tmp_path / "other.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        info = tarfile.TarInfo("README")
+        info.size = 2
+        tar.addfile(info, io.BytesIO(b"hi"))
+    with pytest.raises(SnapshotError):
+        import_cache(CacheManager(tmp_path / "target"), archive)
+
+
+def test_import_rejects_newer_archive_version(source, tmp_path):
+    archive = tmp_path / "cache.tar.gz"
+    manifest = json.dumps({"format": "cmscribe-cache", "version": 99, "entries": []}).encode()
+    with tarfile.open(archive, "w:gz") as tar:
+        info = tarfile.TarInfo("manifest.json")
+        info.size = len(manifest)
+        tar.addfile(info, io.BytesIO(manifest))
+    with pytest.raises(SnapshotError, match="upgrade"):
+        import_cache(CacheManager(tmp_path / "target"), archive)
+
+
+def test_import_of_corrupt_file_raises(tmp_path):
+    archive = tmp_path / "cache.tar.gz"
+    archive.write_bytes(b"not a tarball")
+    with pytest.raises(SnapshotError):
+        import_cache(CacheManager(tmp_path / "target"), archive)